@@ -51,7 +51,11 @@ DEFAULT_SETTINGS = {
     'cliquet.basic_auth_enabled': False,
     'cliquet.batch_max_requests': 25,
     'cliquet.cache_backend': 'cliquet.cache.redis',
+    'cliquet.cache_pool_max_age': 3600,
+    'cliquet.cache_pool_max_idle': 600,
+    'cliquet.cache_pool_min_size': 1,
     'cliquet.cache_pool_size': 10,
+    'cliquet.cache_pool_timeout': 30,
     'cliquet.cache_url': '',
     'cliquet.delete_collection_enabled': True,
     'cliquet.eos': None,
@@ -69,12 +73,28 @@ DEFAULT_SETTINGS = {
     'cliquet.project_docs': '',
     'cliquet.project_name': '',
     'cliquet.project_version': '',
+    'cliquet.records_count_cache_ttl': 3600,
     'cliquet.retry_after_seconds': 30,
     'cliquet.statsd_prefix': 'cliquet',
     'cliquet.statsd_url': None,
     'cliquet.storage_backend': 'cliquet.storage.redis',
+    'cliquet.storage_codec': 'cliquet.storage.redis.JSONCodec',
+    'cliquet.storage_compression_threshold': 0,
+    'cliquet.storage_hash_per_collection': False,
+    'cliquet.storage_lock_timeout': 10,
     'cliquet.storage_max_fetch_size': 10000,
+    'cliquet.storage_max_prepared_statements': 0,
+    'cliquet.storage_partitioned_resources': '',
+    'cliquet.storage_partitions': 0,
+    'cliquet.storage_pool_max_age': 3600,
+    'cliquet.storage_pool_max_idle': 600,
+    'cliquet.storage_pool_min_size': 1,
     'cliquet.storage_pool_size': 10,
+    'cliquet.storage_pool_timeout': 30,
+    'cliquet.storage_replica_urls': '',
+    'cliquet.storage_server_side_cursor': False,
+    'cliquet.storage_tombstone_retention_days': None,
+    'cliquet.storage_transaction_per_request': False,
     'cliquet.storage_url': '',
     'cliquet.userid_hmac_secret': '',
     'cliquet.version_prefix_redirect_enabled': True,
@@ -179,8 +199,10 @@ def attach_http_objects(config):
     """
 
     def on_new_request(event):
-        # Attach objects on requests for easier access.
-        event.request.db = config.registry.storage
+        # Attach objects on requests for easier access. Batch subrequests
+        # may come with their own storage (see ``cliquet.views.batch``).
+        if getattr(event.request, 'db', None) is None:
+            event.request.db = config.registry.storage
         event.request.cache = config.registry.cache
 
     config.add_subscriber(on_new_request, NewRequest)
@@ -276,6 +298,14 @@ def handle_statsd(config):
             if service:
                 client.count('view.%s.%s' % (service.name, request.method))
 
+            # Report connection pools usage.
+            for prefix in ('storage', 'cache'):
+                backend = getattr(request.registry, prefix)
+                pool = getattr(backend, 'pool', None)
+                if pool is not None:
+                    for key, value in pool.stats().items():
+                        client.gauge('%s.pool.%s' % (prefix, key), value)
+
         config.add_subscriber(on_new_response, NewResponse)
 
         return client
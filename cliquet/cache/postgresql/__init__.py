@@ -2,11 +2,9 @@ from __future__ import absolute_import
 
 import os
 
-from six.moves.urllib import parse as urlparse
-
 from cliquet import logger
 from cliquet.cache import CacheBase
-from cliquet.storage.postgresql import PostgreSQLClient
+from cliquet.storage.postgresql import PostgreSQLClient, get_conn_kwargs
 
 
 class PostgreSQL(PostgreSQLClient, CacheBase):
@@ -35,9 +33,22 @@ class PostgreSQL(PostgreSQLClient, CacheBase):
         distinguish schema manipulation privileges from schema usage.
 
 
-    A threaded connection pool is enabled by default::
+    A threaded connection pool is enabled by default. It opens connections
+    on demand, up to the maximum size, and waits for one to be released
+    when exhausted (timeout in seconds)::
 
+        cliquet.cache_pool_min_size = 1
         cliquet.cache_pool_size = 10
+        cliquet.cache_pool_timeout = 30
+
+    Pooled connections are closed after being idle or opened for too long
+    (in seconds, ``0`` to disable)::
+
+        cliquet.cache_pool_max_idle = 600
+        cliquet.cache_pool_max_age = 3600
+
+    Backends connecting to the same database share the same pool. Its usage
+    counters are available with ``backend.pool.stats()``.
 
     .. note::
 
@@ -117,17 +128,16 @@ class PostgreSQL(PostgreSQLClient, CacheBase):
 
 def load_from_config(config):
     settings = config.get_settings()
-    uri = settings['cliquet.cache_url']
-    uri = urlparse.urlparse(uri)
+    conn_kwargs = get_conn_kwargs(settings['cliquet.cache_url'])
     pool_size = int(settings['cliquet.cache_pool_size'])
-
-    conn_kwargs = dict(pool_size=pool_size,
-                       host=uri.hostname,
-                       port=uri.port,
-                       user=uri.username,
-                       password=uri.password,
-                       database=uri.path[1:] if uri.path else '')
-    # Filter specified values only, to preserve PostgreSQL defaults
-    conn_kwargs = dict([(k, v) for k, v in conn_kwargs.items() if v])
-
-    return PostgreSQL(**conn_kwargs)
+    pool_min_size = int(settings['cliquet.cache_pool_min_size'])
+    pool_timeout = float(settings['cliquet.cache_pool_timeout'])
+    pool_max_idle = float(settings['cliquet.cache_pool_max_idle'])
+    pool_max_age = float(settings['cliquet.cache_pool_max_age'])
+
+    return PostgreSQL(pool_size=pool_size,
+                      pool_min_size=pool_min_size,
+                      pool_timeout=pool_timeout,
+                      pool_max_idle=pool_max_idle,
+                      pool_max_age=pool_max_age,
+                      **conn_kwargs)
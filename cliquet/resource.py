@@ -1,3 +1,4 @@
+import hashlib
 import re
 
 import colander
@@ -15,7 +16,7 @@ from cliquet.errors import (http_error, raise_invalid, ERRORS,
 from cliquet.schema import ResourceSchema
 from cliquet.utils import (
     COMPARISON, classname, native_value, decode64, encode64, json,
-    current_service
+    current_service, msec_time, JSONStream
 )
 
 
@@ -23,7 +24,8 @@ def crud(**kwargs):
     """
     Decorator for resource classes.
 
-    By default, the lower class name of the resource is used to build URLs.
+    By default, the :attr:`name <.BaseResource.name>` of the resource (i.e.
+    its lower class name) is used to build URLs.
 
     This decorator accepts the same parameters as the :rtd:`Cornice <cornice>`
     :meth:`~cornice:cornice.resource.resource` decorator.
@@ -39,7 +41,7 @@ def crud(**kwargs):
                 ...
     """
     def wrapper(klass):
-        resource_name = klass.__name__.lower()
+        resource_name = get_resource_name(klass)
         params = dict(collection_path='/{0}s'.format(resource_name),
                       path='/{0}s/{{id}}'.format(resource_name),
                       description='Collection of {0}'.format(resource_name),
@@ -52,6 +54,13 @@ def crud(**kwargs):
     return wrapper
 
 
+def get_resource_name(klass):
+    """Return the :attr:`name <.BaseResource.name>` of the resource class
+    `klass`, which must not depend on the request.
+    """
+    return klass.name.fget(klass.__new__(klass))
+
+
 class BaseResource(object):
     """Base resource class providing every endpoint."""
     mapping = ResourceSchema()
@@ -148,7 +157,8 @@ class BaseResource(object):
         records, total_records, next_page = self.get_records()
 
         headers = self.request.response.headers
-        headers['Total-Records'] = ('%s' % total_records)
+        if total_records is not None:
+            headers['Total-Records'] = ('%s' % total_records)
 
         if next_page:
             headers['Next-Page'] = next_page
@@ -156,6 +166,13 @@ class BaseResource(object):
             'items': records,
         }
 
+        if not isinstance(records, list):
+            # Records streamed by storage are serialized as they are fetched.
+            response = self.request.response
+            response.content_type = 'application/json'
+            response.app_iter = JSONStream(body)
+            return response
+
         return body
 
     @resource.view(permission='readwrite')
@@ -343,32 +360,57 @@ class BaseResource(object):
 
         :raises: :exc:`~pyramid:pyramid.httpexceptions.HTTPBadRequest`
             if filters or sorting are invalid.
-        :returns: A tuple with the list of records in the current page,
-            the total number of records in the result set, and the next page
-            url.
+        :returns: A tuple with the list of records in the current page
+            (or a generator if streamed by storage), the total number of
+            records in the result set (``None`` if not counted), and the next
+            page url.
         :rtype: tuple
         """
         filters = self._extract_filters()
         sorting = self._extract_sorting()
         pagination_rules, limit = self._extract_pagination_rules_from_token(
             sorting)
+        include_count = self._extract_count()
 
         include_deleted = self.modified_field in [f.field for f in filters]
 
+        # The total of paginated lists is counted once, and read from cache
+        # for the next pages, until the collection changes.
+        settings = self.request.registry.settings
+        cache = self.request.registry.cache
+        cache_ttl = settings['cliquet.records_count_cache_ttl']
+        count_key = None
+        cached_count = None
+        if include_count and limit and cache_ttl:
+            count_key = self._records_count_cache_key(filters)
+            if pagination_rules:
+                cached_count = cache.get(count_key)
+
         records, total_records = self.db.get_all(
             filters=filters,
             sorting=sorting,
             pagination_rules=pagination_rules,
             limit=limit,
             include_deleted=include_deleted,
+            include_count=include_count and cached_count is None,
             **self.db_kwargs)
 
+        if not include_count:
+            total_records = None
+        elif cached_count is not None:
+            total_records = int(cached_count)
+
         next_page = None
-        if limit and len(records) == limit and total_records > limit:
-            next_page = self._next_page_url(sorting, limit, records[-1])
+        if limit and len(records) == limit:
+            if total_records is None or total_records > limit:
+                next_page = self._next_page_url(sorting, limit, records[-1])
 
-        # Bind metric about response size.
-        logger.bind(nb_records=len(records), limit=limit)
+        if next_page and count_key and cached_count is None:
+            cache.set(count_key, total_records, float(cache_ttl))
+
+        # Bind metric about response size (unknown if records are streamed).
+        nb_records = len(records) if isinstance(records, list) else None
+        logger.bind(nb_records=nb_records, limit=limit)
 
         return records, total_records, next_page
 
@@ -398,9 +440,7 @@ class BaseResource(object):
             return self.db.get(record_id=record_id,
                                **self.db_kwargs)
         except storage_exceptions.RecordNotFoundError:
-            response = http_error(HTTPNotFound(),
-                                  errno=ERRORS.INVALID_RESOURCE_ID)
-            raise response
+            self._raise_404()
 
     def create_record(self, record):
         """Create a record in the collection.
@@ -443,6 +483,10 @@ class BaseResource(object):
 
         :raises: :exc:`~pyramid:pyramid.httpexceptions.HTTPConflict`
             if a unique field constraint is violated.
+        :raises:
+            :exc:`~pyramid:pyramid.httpexceptions.HTTPPreconditionFailed` if
+            ``If-Unmodified-Since`` header is provided and record modified
+            in the iterim.
 
         :returns: the updated record.
         :rtype: dict
@@ -454,12 +498,16 @@ class BaseResource(object):
                 return new
 
         record_id = new[self.id_field]
+        unmodified_since = self._extract_unmodified_since()
         try:
             return self.db.update(record_id=record_id,
                                   record=new,
+                                  if_unmodified_since=unmodified_since,
                                   **self.db_kwargs)
         except storage_exceptions.UnicityError as e:
             self._raise_conflict(e)
+        except storage_exceptions.ModifiedMeanwhileError:
+            self._raise_412()
 
     def delete_record(self, record):
         """Delete a record in the collection.
@@ -477,11 +525,22 @@ class BaseResource(object):
 
         :param dict record: the record to delete
 
+        :raises:
+            :exc:`~pyramid:pyramid.httpexceptions.HTTPPreconditionFailed` if
+            ``If-Unmodified-Since`` header is provided and record modified
+            in the iterim.
+
         :returns: the deleted record.
         :rtype: dict
         """
         record_id = record[self.id_field]
-        return self.db.delete(record_id=record_id, **self.db_kwargs)
+        unmodified_since = self._extract_unmodified_since()
+        try:
+            return self.db.delete(record_id=record_id,
+                                  if_unmodified_since=unmodified_since,
+                                  **self.db_kwargs)
+        except storage_exceptions.ModifiedMeanwhileError:
+            self._raise_412()
 
     def process_record(self, new, old=None):
         """Hook for processing records before they reach storage, to introduce
@@ -610,11 +669,9 @@ class BaseResource(object):
         :raises:
             :exc:`~pyramid:pyramid.httpexceptions.HTTPPreconditionFailed`
         """
-        unmodified_since = self.request.headers.get('If-Unmodified-Since')
-
-        if unmodified_since:
-            unmodified_since = int(unmodified_since)
+        unmodified_since = self._extract_unmodified_since()
 
+        if unmodified_since is not None:
             if record:
                 current_timestamp = record[self.modified_field]
             else:
@@ -622,12 +679,38 @@ class BaseResource(object):
                     **self.db_kwargs)
 
             if current_timestamp > unmodified_since:
-                error_msg = 'Resource was modified meanwhile'
-                response = http_error(HTTPPreconditionFailed(),
-                                      errno=ERRORS.MODIFIED_MEANWHILE,
-                                      message=error_msg)
-                self._add_timestamp_header(response)
-                raise response
+                self._raise_412()
+
+    def _extract_unmodified_since(self):
+        """Return the timestamp specified in the ``If-Unmodified-Since``
+        header, or ``None`` if not provided.
+        """
+        unmodified_since = self.request.headers.get('If-Unmodified-Since')
+        if not unmodified_since:
+            return None
+        return int(unmodified_since)
+
+    def _raise_412(self):
+        """Helper to raise precondition failed responses.
+
+        :raises:
+            :exc:`~pyramid:pyramid.httpexceptions.HTTPPreconditionFailed`
+        """
+        error_msg = 'Resource was modified meanwhile'
+        response = http_error(HTTPPreconditionFailed(),
+                              errno=ERRORS.MODIFIED_MEANWHILE,
+                              message=error_msg)
+        self._add_timestamp_header(response)
+        raise response
+
+    def _raise_404(self):
+        """Helper to raise not found responses for records.
+
+        :raises: :exc:`~pyramid:pyramid.httpexceptions.HTTPNotFound`
+        """
+        response = http_error(HTTPNotFound(),
+                              errno=ERRORS.INVALID_RESOURCE_ID)
+        raise response
 
     def _raise_conflict(self, exception):
         """Helper to raise conflict responses.
@@ -659,6 +742,28 @@ class BaseResource(object):
             }
             raise_invalid(self.request, **error_details)
 
+    def _raise_400_if_tombstones_expired(self, since):
+        """Raise 400 if the tombstones of records deleted after `since`
+        may have been purged, since the changes could not be complete.
+
+        :raises: :class:`~pyramid:pyramid.httpexceptions.HTTPBadRequest`
+        """
+        settings = self.request.registry.settings
+        retention = settings['cliquet.storage_tombstone_retention_days']
+        if not retention:
+            return
+
+        oldest = msec_time() - int(retention) * 24 * 3600 * 1000
+        if since < oldest:
+            error_msg = ('_since is older than the deleted records retention '
+                         'period ({0} days)').format(retention)
+            error_details = {
+                'name': '_since',
+                'location': 'querystring',
+                'description': error_msg
+            }
+            raise_invalid(self.request, **error_details)
+
     def _extract_filters(self, queryparams=None):
         """Extracts filters from QueryString parameters."""
         if not queryparams:
@@ -666,9 +771,9 @@ class BaseResource(object):
 
         filters = []
 
-        for param, value in queryparams.items():
+        for param, paramvalue in queryparams.items():
             param = param.strip()
-            value = native_value(value)
+            value = native_value(paramvalue)
 
             # Ignore specific fields
             if param.startswith('_') and param not in ('_since', '_to'):
@@ -685,6 +790,7 @@ class BaseResource(object):
                     raise_invalid(self.request, **error_details)
 
                 if param == '_since':
+                    self._raise_400_if_tombstones_expired(value)
                     operator = COMPARISON.GT
                 else:
                     operator = COMPARISON.LT
@@ -693,13 +799,16 @@ class BaseResource(object):
                 )
                 continue
 
-            m = re.match(r'^(min|max|not|lt|gt)_(\w+)$', param)
+            m = re.match(r'^(min|max|not|lt|gt|in)_(\w+)$', param)
             if m:
                 keyword, field = m.groups()
                 operator = getattr(COMPARISON, keyword.upper())
             else:
                 operator, field = COMPARISON.EQ, param
 
+            if operator == COMPARISON.IN:
+                value = [native_value(v) for v in paramvalue.split(',')]
+
             if not self.is_known_field(field):
                 error_details = {
                     'location': 'querystring',
@@ -803,6 +912,28 @@ class BaseResource(object):
             filters = self._build_pagination_rules(sorting, last_record)
         return filters, limit
 
+    def _extract_count(self):
+        """Return ``False`` if the client asked not to count the records
+        with the ``_count`` querystring parameter."""
+        include_count = native_value(self.request.GET.get('_count', 'true'))
+        if not isinstance(include_count, bool):
+            error_details = {
+                'location': 'querystring',
+                'description': "_count should be a boolean"
+            }
+            raise_invalid(self.request, **error_details)
+        return include_count
+
+    def _records_count_cache_key(self, filters):
+        """Build the cache key of the number of records matching the
+        filters. Since the collection timestamp is part of it, counts are not
+        read from cache anymore once the collection changed."""
+        query = [self.name, self.db_kwargs['user_id'], self.timestamp]
+        query += sorted([json.dumps([f.field, f.operator, f.value])
+                         for f in filters])
+        digest = hashlib.sha256(json.dumps(query).encode('utf-8'))
+        return 'records_count_%s' % digest.hexdigest()
+
     def _next_page_url(self, sorting, limit, last_record):
         """Build the Next-Page header from where we stopped."""
         token = self._build_pagination_token(sorting, last_record)
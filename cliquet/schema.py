@@ -25,6 +25,11 @@ class ResourceSchema(colander.MappingSchema):
         """Fields that must have unique values for the user collection.
         During records creation and modification, a conflict error will be
         raised if unicity is about to be violated.
+
+        .. note::
+
+            With PostgreSQL, unicity is enforced by unique indices, created
+            when the ``cliquet migrate`` command is run.
         """
 
         readonly_fields = tuple()
@@ -34,6 +39,19 @@ class ResourceSchema(colander.MappingSchema):
         :meth:`cliquet.resource.BaseResource.process_record`.
         """
 
+        indexed_fields = tuple()
+        """Fields used for filtering or sorting the collection, that should
+        be indexed by the storage backend, if supported. Indices are created
+        when the ``cliquet migrate`` command is run.
+
+        .. note::
+
+            With PostgreSQL, records missing an indexed field come after
+            the others in ascending order, and before them in descending
+            order. Values of numeric fields that are not numbers are sorted
+            as missing.
+        """
+
         preserve_unknown = False
         """Define if unknown fields should be preserved or not.
 
@@ -6,6 +6,8 @@ import warnings
 
 from pyramid.paster import bootstrap
 
+from cliquet import logger, utils
+
 
 def deprecated_init(env):
     message = '"cliquet init" is deprecated. Use "cliquet migrate" instead.'
@@ -20,6 +22,41 @@ def init_schema(env):
     storage_backend = env['registry'].storage
     storage_backend.initialize_schema()
 
+    from cliquet.resource import get_resource_name
+
+    for resource in get_resources(env['registry']):
+        resource_name = get_resource_name(resource)
+        storage_backend.create_indices(resource_name, resource.mapping)
+
+
+def purge_deleted(env):
+    registry = env['registry']
+    settings = registry.settings
+    retention = settings['cliquet.storage_tombstone_retention_days']
+    if not retention:
+        message = ('No retention period configured for deleted records '
+                   '(cliquet.storage_tombstone_retention_days).')
+        logger.error(message)
+        return 1
+
+    before = utils.msec_time() - int(retention) * 24 * 3600 * 1000
+    count = registry.storage.purge_deleted(before=before)
+    logger.info('Purged %s deleted records older than %s days.' % (
+        count, retention))
+
+
+def get_resources(registry):
+    """Return the resource classes registered as Cornice services."""
+    from cliquet.resource import BaseResource
+
+    resources = set()
+    for service in registry.cornice_services.values():
+        for _, _, args in service.definitions:
+            klass = args.get('klass')
+            if klass is not None and issubclass(klass, BaseResource):
+                resources.add(klass)
+    return sorted(resources, key=lambda klass: klass.__name__)
+
 
 def main():
     description = """\
@@ -39,11 +76,13 @@ def main():
     parser_deprecated_init.set_defaults(func=deprecated_init)
     parser_init_schema = subparsers.add_parser('migrate')
     parser_init_schema.set_defaults(func=init_schema)
+    parser_purge_deleted = subparsers.add_parser('purge-deleted')
+    parser_purge_deleted.set_defaults(func=purge_deleted)
 
     args = parser.parse_args(sys.argv[1:])
 
     env = bootstrap(args.ini_file)
-    args.func(env)
+    return args.func(env)
 
 
 if __name__ == '__main__':  # pragma: no cover
@@ -34,6 +34,21 @@ class StorageBase(object):
         """
         raise NotImplementedError
 
+    def create_indices(self, resource_name, mapping):
+        """Create the indices serving the fields declared in the
+        ``indexed_fields`` option of the resource `mapping`, and the ones
+        enforcing its ``unique_fields`` option.
+
+        It is called by the ``cliquet migrate`` command for every registered
+        resource. By default, nothing is done since not every backend supports
+        indices.
+
+        :param str resource_name: the name of the resource.
+        :param mapping: the resource schema.
+        :type mapping: :class:`cliquet.schema.ResourceSchema`
+        """
+        pass
+
     def flush(self):
         """Remove **every** record from this storage.
         """
@@ -116,7 +131,24 @@ class StorageBase(object):
         """
         raise NotImplementedError
 
-    def update(self, resource, user_id, record_id, record):
+    def get_many(self, resource, user_id, records_ids):
+        """Retrieve the records with specified `records_ids` at once. Unlike
+        :meth:`cliquet.storage.StorageBase.get`, records that are not found
+        are skipped.
+
+        :param resource: the record associated resource
+        :type resource: :class:`cliquet.resource.BaseResource`
+
+        :param str user_id: the owner of the records
+        :param list records_ids: unique identifiers of the records
+
+        :returns: the records found, in the same order.
+        :rtype: list of dict
+        """
+        raise NotImplementedError
+
+    def update(self, resource, user_id, record_id, record,
+               if_unmodified_since=None):
         """Overwrite the `record` with the specified `record_id`.
 
         If the specified id is not found, the record is created with the
@@ -127,6 +159,7 @@ class StorageBase(object):
             This will update the collection timestamp.
 
         :raises: :exc:`cliquet.storage.exceptions.UnicityError`
+        :raises: :exc:`cliquet.storage.exceptions.ModifiedMeanwhileError`
 
         :param resource: the record associated resource
         :type resource: :class:`cliquet.resource.BaseResource`
@@ -134,13 +167,15 @@ class StorageBase(object):
         :param str user_id: the owner of the record
         :param str record_id: unique identifier of the record
         :param dict record: the record to update or create.
+        :param int if_unmodified_since: Optionally overwrite the existing
+            record only if its timestamp is not greater, atomically.
 
         :returns: the updated record.
         :rtype: dict
         """
         raise NotImplementedError
 
-    def delete(self, resource, user_id, record_id):
+    def delete(self, resource, user_id, record_id, if_unmodified_since=None):
         """Delete the record with specified `record_id`, and raise error
         if not found.
 
@@ -153,12 +188,15 @@ class StorageBase(object):
             This will update the collection timestamp.
 
         :raises: :exc:`cliquet.storage.exceptions.RecordNotFoundError`
+        :raises: :exc:`cliquet.storage.exceptions.ModifiedMeanwhileError`
 
         :param resource: the record associated resource
         :type resource: :class:`cliquet.resource.BaseResource`
 
         :param str user_id: the owner of the record
         :param str record_id: unique identifier of the record
+        :param int if_unmodified_since: Optionally delete the record only
+            if its timestamp is not greater, atomically.
 
         :returns: the deleted record, with minimal set of attributes.
         :rtype: dict
@@ -181,8 +219,99 @@ class StorageBase(object):
         """
         raise NotImplementedError
 
+    def create_many(self, resource, user_id, records):
+        """Create the specified `records` in this `resource` for this
+        `user_id`, like :meth:`cliquet.storage.StorageBase.create` but at
+        once. If an error is raised, none of them is created.
+
+        Records are given new ids, unless they already have one. In this
+        case, existing records with the same ids are never overwritten.
+
+        .. note::
+
+            This will update the collection timestamp, and records are given
+            distinct timestamps in the order of the list.
+
+        :raises: :exc:`cliquet.storage.exceptions.UnicityError` (also if one
+            of the specified ids is already taken)
+
+        :param resource: the record associated resource
+        :type resource: :class:`cliquet.resource.BaseResource`
+
+        :param str user_id: the owner of the records
+        :param list records: the records to create.
+
+        :returns: the newly created records, in the same order.
+        :rtype: list of dict
+        """
+        raise NotImplementedError
+
+    def update_many(self, resource, user_id, records):
+        """Overwrite the specified `records` at once, or create them if not
+        found (see :meth:`cliquet.storage.StorageBase.update`). Their ids are
+        read from :attr:`cliquet.resource.BaseResource.id_field`, and are
+        expected to be distinct. If an error is raised, none of them is
+        written.
+
+        .. note::
+
+            This will update the collection timestamp.
+
+        :raises: :exc:`cliquet.storage.exceptions.UnicityError`
+
+        :param resource: the record associated resource
+        :type resource: :class:`cliquet.resource.BaseResource`
+
+        :param str user_id: the owner of the records
+        :param list records: the records to update or create.
+
+        :returns: the updated records, in the same order.
+        :rtype: list of dict
+        """
+        raise NotImplementedError
+
+    def delete_many(self, resource, user_id, records_ids):
+        """Delete the records with specified distinct `records_ids` at once,
+        and raise error if one of them is not found, in which case none of
+        them is deleted.
+
+        .. note::
+
+            This will update the collection timestamp.
+
+        :raises: :exc:`cliquet.storage.exceptions.RecordNotFoundError`
+
+        :param resource: the record associated resource
+        :type resource: :class:`cliquet.resource.BaseResource`
+
+        :param str user_id: the owner of the records
+        :param list records_ids: unique identifiers of the records
+
+        :returns: the deleted records, with minimal set of attributes, in the
+            same order.
+        :rtype: list of dict
+        """
+        raise NotImplementedError
+
+    def purge_deleted(self, before, max_batch_size=1000):
+        """Remove the tombstones of records deleted before the specified
+        timestamp, in every resource and for every user.
+
+        Tombstones are removed by batches, in order to avoid locking the
+        backend for too long.
+
+        :param int before: epoch timestamp in milliseconds.
+        :param int max_batch_size: maximum number of tombstones removed at
+            once.
+
+        :returns: the number of removed tombstones.
+        :rtype: int
+        """
+        raise NotImplementedError
+
     def get_all(self, resource, user_id, filters=None, sorting=None,
-                pagination_rules=None, limit=None, include_deleted=False):
+                pagination_rules=None, limit=None, include_deleted=False,
+                include_count=True):
         """Retrieve all records in this `resource` for this `user_id`.
 
         :param resource: the record associated resource
@@ -193,7 +322,8 @@ class StorageBase(object):
         :param filters: Optionally filter the records by their attribute.
             Each filter in this list is a tuple of a field, a value and a
             comparison (see `cliquet.utils.COMPARISON`). All filters
-            are combined using *AND*.
+            are combined using *AND*. The value of ``COMPARISON.IN`` filters
+            is a list.
         :type filters: list of :class:`cliquet.storage.Filter`
 
         :param sorting: Optionnally sort the records by attribute.
@@ -214,8 +344,12 @@ class StorageBase(object):
         :param bool include_deleted: Optionnally include the deleted records
             that match the filters.
 
-        :returns: the limited list of records, and the total number of
-            matching records in the collection (deleted ones excluded).
+        :param bool include_count: If ``False``, backends for which counting
+            is costly can skip it, and return ``None`` as the total.
+
+        :returns: the limited list of records (or a generator, if the backend
+            streams them), and the total number of matching records in the
+            collection (deleted ones excluded).
         :rtype: tuple (list, integer)
         """
         raise NotImplementedError
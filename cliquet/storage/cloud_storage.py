@@ -20,6 +20,7 @@ FILTERS = {
     COMPARISON.NOT: 'not_',
     COMPARISON.EQ: '',
     COMPARISON.GT: 'gt_',
+    COMPARISON.IN: 'in_',
 }
 
 
@@ -40,6 +41,9 @@ def wrap_http_error(func):
             if status_code == 404:
                 record_id = '?'
                 raise exceptions.RecordNotFoundError(record_id)
+            if status_code == 412:
+                record_id = '?'
+                raise exceptions.ModifiedMeanwhileError(record_id)
             logger.debug(body)
             raise exceptions.BackendError(original=e)
     return wrapped
@@ -81,13 +85,16 @@ class CloudStorage(StorageBase):
     def _build_url(self, resource):
         return self.server_url + API_PREFIX + resource
 
-    def _build_headers(self, resource):
+    def _build_headers(self, resource, if_unmodified_since=None):
         original = resource.request
         auth_token = original.headers['Authorization']
-        return {
+        headers = {
             'Content-Type': 'application/json',
             'Authorization': auth_token
         }
+        if if_unmodified_since is not None:
+            headers['If-Unmodified-Since'] = str(if_unmodified_since)
+        return headers
 
     def initialize_schema(self):
         # Nothing to do.
@@ -106,6 +113,10 @@ class CloudStorage(StorageBase):
         resp.raise_for_status()
         return int(resp.headers['Last-Modified'])
 
+    def purge_deleted(self, before, max_batch_size=1000):
+        # Deleted records are kept, and purged, by the remote server.
+        return 0
+
     def check_unicity(self, resource, user_id, record):
         rules = get_unicity_rules(resource, user_id, record)
         for rule in rules:
@@ -143,7 +154,20 @@ class CloudStorage(StorageBase):
         return resp.json()
 
     @wrap_http_error
-    def update(self, resource, user_id, record_id, record):
+    def get_many(self, resource, user_id, records_ids):
+        if not records_ids:
+            return []
+        filters = [Filter(resource.id_field, list(records_ids),
+                          COMPARISON.IN)]
+        results, _ = self.get_all(resource, user_id, filters=filters,
+                                  limit=len(records_ids))
+        records = dict([(r[resource.id_field], r) for r in results])
+        return [records[record_id] for record_id in records_ids
+                if record_id in records]
+
+    @wrap_http_error
+    def update(self, resource, user_id, record_id, record,
+               if_unmodified_since=None):
         self.check_unicity(resource, user_id, record)
         url = self._build_url(self.record_url.format(resource.name,
                                                      record_id))
@@ -156,17 +180,19 @@ class CloudStorage(StorageBase):
         else:
             if resource.id_field in record:
                 del record[resource.id_field]
+            headers = self._build_headers(resource, if_unmodified_since)
             resp = self._client.patch(url,
                                       data=json.dumps(record),
-                                      headers=self._build_headers(resource))
+                                      headers=headers)
         resp.raise_for_status()
         return resp.json()
 
     @wrap_http_error
-    def delete(self, resource, user_id, record_id):
+    def delete(self, resource, user_id, record_id, if_unmodified_since=None):
         url = self._build_url(self.record_url.format(resource.name,
                                                      record_id))
-        resp = self._client.delete(url, headers=self._build_headers(resource))
+        headers = self._build_headers(resource, if_unmodified_since)
+        resp = self._client.delete(url, headers=headers)
         resp.raise_for_status()
         return resp.json()
 
@@ -175,18 +201,93 @@ class CloudStorage(StorageBase):
         url = self._build_url(self.collection_url.format(resource.name))
         params = []
         if filters:
-            params += [("%s%s" % (FILTERS[op], k), v) for k, v, op in filters]
+            params += self._filters_as_params(filters)
         resp = self._client.delete(url,
                                    params=params,
                                    headers=self._build_headers(resource))
         resp.raise_for_status()
 
+    @wrap_http_error
+    def create_many(self, resource, user_id, records):
+        specified = [r[resource.id_field] for r in records
+                     if r.get(resource.id_field) is not None]
+        existing = self.get_many(resource, user_id, specified)
+        if existing:
+            raise exceptions.UnicityError(resource.id_field, existing[0])
+
+        subrequests = []
+        for record in records:
+            self.check_unicity(resource, user_id, record)
+            record = record.copy()
+            record_id = record.pop(resource.id_field, None)
+            if record_id is None:
+                record_id = resource.id_generator()
+            subrequests.append({
+                'method': 'PUT',
+                'path': self.record_url.format(resource.name, record_id),
+                'body': record
+            })
+        return self._batch(resource, subrequests)
+
+    @wrap_http_error
+    def update_many(self, resource, user_id, records):
+        subrequests = []
+        for record in records:
+            self.check_unicity(resource, user_id, record)
+            record = record.copy()
+            record_id = record.pop(resource.id_field)
+            subrequests.append({
+                'method': 'PUT',
+                'path': self.record_url.format(resource.name, record_id),
+                'body': record
+            })
+        return self._batch(resource, subrequests)
+
+    @wrap_http_error
+    def delete_many(self, resource, user_id, records_ids):
+        subrequests = [{
+            'method': 'DELETE',
+            'path': self.record_url.format(resource.name, record_id)
+        } for record_id in records_ids]
+        return self._batch(resource, subrequests)
+
+    def _batch(self, resource, subrequests):
+        """Send the specified subrequests to the remote batch endpoint, and
+        return their responses bodies.
+
+        .. note::
+
+            Unlike other backends, subrequests are not run in a single
+            transaction by the remote server.
+        """
+        if not subrequests:
+            return []
+
+        batch_payload = {'requests': subrequests}
+        resp = self._client.post(self._build_url('/batch'),
+                                 data=json.dumps(batch_payload),
+                                 headers=self._build_headers(resource))
+        resp.raise_for_status()
+        batch_responses = resp.json()['responses']
+
+        for batch_response in batch_responses:
+            if batch_response['status'] == 404:
+                record_id = batch_response['path'].rsplit('/', 1)[-1]
+                raise exceptions.RecordNotFoundError(record_id)
+            if batch_response['status'] >= 400:
+                http_error = requests.HTTPError('Batch error', response=resp)
+                raise exceptions.BackendError(original=http_error)
+
+        return [r['body'] for r in batch_responses]
+
     def _filters_as_params(self, filters):
         params = []
         for k, v, op in filters:
             if isinstance(v, six.string_types):
                 # Literals '\' should be preserved in querystring
                 v = v.replace("\\", "\\\\")
+            elif op == COMPARISON.IN:
+                v = ','.join([six.text_type(value) for value in v])
             params.append(("%s%s" % (FILTERS[op], k), v))
         return params
 
@@ -195,7 +296,8 @@ class CloudStorage(StorageBase):
 
     @wrap_http_error
     def get_all(self, resource, user_id, filters=None, sorting=None,
-                pagination_rules=None, limit=None, include_deleted=False):
+                pagination_rules=None, limit=None, include_deleted=False,
+                include_count=True):
         url = self.collection_url.format(resource.name)
 
         params = []
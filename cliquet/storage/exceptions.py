@@ -23,6 +23,14 @@ class RecordNotFoundError(Exception):
     pass
 
 
+class ModifiedMeanwhileError(Exception):
+    """An exception raised when a conditional write targets a record that
+    was modified after the specified timestamp.
+
+    """
+    pass
+
+
 class IntegrityError(Exception):
     pass
 
@@ -1,5 +1,5 @@
 import operator
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 from cliquet import utils
 from cliquet.storage import StorageBase, exceptions, Filter
@@ -23,9 +23,8 @@ class MemoryBasedStorage(StorageBase):
 
     def delete_all(self, resource, user_id, filters=None):
         records, count = self.get_all(resource, user_id, filters=filters)
-        deleted = [self.delete(resource, user_id, r[resource.id_field])
-                   for r in records]
-        return deleted
+        records_ids = [r[resource.id_field] for r in records]
+        return self.delete_many(resource, user_id, records_ids)
 
     def strip_deleted_record(self, resource, user_id, record):
         """Strip the record of all its fields expect id and timestamp,
@@ -54,6 +53,55 @@ class MemoryBasedStorage(StorageBase):
                 field = filters[0].field
                 raise exceptions.UnicityError(field, existing[0])
 
+    def check_unmodified_since(self, resource, existing,
+                               if_unmodified_since):
+        """Check that the specified existing record was not modified after
+        the specified timestamp, if any.
+        """
+        if if_unmodified_since is None:
+            return
+        if existing[resource.modified_field] > if_unmodified_since:
+            record_id = existing[resource.id_field]
+            raise exceptions.ModifiedMeanwhileError(record_id)
+
+    def check_unicity_many(self, resource, user_id, records):
+        """Check that the specified records, with their ids assigned, do not
+        violate unicity constraints, neither with existing records nor among
+        themselves. Existing records are fetched once.
+        """
+        unique_fields = resource.mapping.get_option('unique_fields')
+        if not unique_fields:
+            return
+
+        # Existing records that are overwritten cannot conflict anymore.
+        records_ids = set([r[resource.id_field] for r in records])
+        existing, count = self.get_all(resource, user_id)
+        candidates = [r for r in existing
+                      if r[resource.id_field] not in records_ids]
+
+        for record in records:
+            unicity_rules = get_unicity_rules(resource, user_id, record)
+            for filters in unicity_rules:
+                conflicting = list(self.apply_filters(candidates, filters))
+                if conflicting:
+                    field = filters[0].field
+                    raise exceptions.UnicityError(field, conflicting[0])
+            candidates.append(record)
+
+    def extract_records_ids(self, resource, filters):
+        """Return the ids of records targeted by the ``COMPARISON.IN``
+        filters on the id field, in order to look them up directly, or
+        ``None`` if there is none.
+        """
+        records_ids = None
+        for filtr in filters or []:
+            if (filtr.field == resource.id_field and
+                    filtr.operator == COMPARISON.IN):
+                values = [v for v in filtr.value
+                          if records_ids is None or v in records_ids]
+                records_ids = list(OrderedDict.fromkeys(values))
+        return records_ids
+
     def apply_filters(self, records, filters):
         """Filter the specified records, using basic iteration.
         """
@@ -64,6 +112,7 @@ class MemoryBasedStorage(StorageBase):
             COMPARISON.NOT: operator.ne,
             COMPARISON.MIN: operator.ge,
             COMPARISON.GT: operator.gt,
+            COMPARISON.IN: lambda value, values: value in values,
         }
 
         for record in records:
@@ -124,6 +173,8 @@ class Memory(MemoryBasedStorage):
     def flush(self):
         self._store = tree()
         self._cemetery = tree()
+        # Timestamps of tombstones, by resource name, user id and record id.
+        self._cemetery_timestamps = {}
         self._timestamps = defaultdict(dict)
 
     def collection_timestamp(self, resource, user_id):
@@ -132,9 +183,12 @@ class Memory(MemoryBasedStorage):
             return ts
         return self._bump_timestamp(resource, user_id)
 
-    def _bump_timestamp(self, resource, user_id):
+    def _bump_timestamp(self, resource, user_id, count=1):
         """Timestamp are base on current millisecond.
 
+        If `count` is greater than one, as many consecutive timestamps are
+        reserved, and the first one is returned.
+
         .. note ::
 
             Here it is assumed that if requests from the same user burst in,
@@ -145,7 +199,7 @@ class Memory(MemoryBasedStorage):
         current = utils.msec_time()
         if previous and previous >= current:
             current = previous + 1
-        self._timestamps[resource.name][user_id] = current
+        self._timestamps[resource.name][user_id] = current + count - 1
         return current
 
     def create(self, resource, user_id, record):
@@ -163,7 +217,18 @@ class Memory(MemoryBasedStorage):
             raise exceptions.RecordNotFoundError(record_id)
         return collection[record_id]
 
-    def update(self, resource, user_id, record_id, record):
+    def get_many(self, resource, user_id, records_ids):
+        collection = self._store[resource.name][user_id]
+        return [collection[record_id] for record_id in records_ids
+                if record_id in collection]
+
+    def update(self, resource, user_id, record_id, record,
+               if_unmodified_since=None):
+        existing = self._store[resource.name][user_id].get(record_id)
+        if existing is not None:
+            self.check_unmodified_since(resource, existing,
+                                        if_unmodified_since)
+
         record = record.copy()
         record[resource.id_field] = record_id
         self.check_unicity(resource, user_id, record)
@@ -172,24 +237,103 @@ class Memory(MemoryBasedStorage):
         self._store[resource.name][user_id][record_id] = record
         return record
 
-    def delete(self, resource, user_id, record_id):
+    def delete(self, resource, user_id, record_id, if_unmodified_since=None):
         existing = self.get(resource, user_id, record_id)
+        self.check_unmodified_since(resource, existing, if_unmodified_since)
         self.set_record_timestamp(resource, user_id, existing)
         existing = self.strip_deleted_record(resource, user_id, existing)
 
         # Add to deleted items, remove from store.
-        self._cemetery[resource.name][user_id][record_id] = existing.copy()
+        self._bury(resource, user_id, existing.copy())
         self._store[resource.name][user_id].pop(record_id)
 
         return existing
 
+    def create_many(self, resource, user_id, records):
+        if not records:
+            return []
+
+        records = [r.copy() for r in records]
+        collection = self._store[resource.name][user_id]
+        for record in records:
+            record_id = record.get(resource.id_field)
+            if record_id is None:
+                record[resource.id_field] = resource.id_generator()
+            elif record_id in collection:
+                raise exceptions.UnicityError(resource.id_field,
+                                              collection[record_id])
+        return self.update_many(resource, user_id, records)
+
+    def update_many(self, resource, user_id, records):
+        if not records:
+            return []
+
+        records = [r.copy() for r in records]
+        self.check_unicity_many(resource, user_id, records)
+
+        timestamp = self._bump_timestamp(resource, user_id, len(records))
+        collection = self._store[resource.name][user_id]
+        for i, record in enumerate(records):
+            record[resource.modified_field] = timestamp + i
+            collection[record[resource.id_field]] = record
+        return records
+
+    def delete_many(self, resource, user_id, records_ids):
+        if not records_ids:
+            return []
+
+        existing = [self.get(resource, user_id, record_id)
+                    for record_id in records_ids]
+
+        timestamp = self._bump_timestamp(resource, user_id, len(existing))
+        deleted = []
+        for i, record in enumerate(existing):
+            record[resource.modified_field] = timestamp + i
+            tombstone = self.strip_deleted_record(resource, user_id, record)
+            record_id = tombstone[resource.id_field]
+            self._bury(resource, user_id, tombstone)
+            self._store[resource.name][user_id].pop(record_id)
+            deleted.append(tombstone.copy())
+        return deleted
+
+    def _bury(self, resource, user_id, tombstone):
+        """Add the `tombstone` of a deleted record to the cemetery, with its
+        timestamp for later purges.
+        """
+        record_id = tombstone[resource.id_field]
+        self._cemetery[resource.name][user_id][record_id] = tombstone
+        key = (resource.name, user_id, record_id)
+        self._cemetery_timestamps[key] = tombstone[resource.modified_field]
+
+    def purge_deleted(self, before, max_batch_size=1000):
+        count = 0
+        for key, timestamp in list(self._cemetery_timestamps.items()):
+            if timestamp < before:
+                resource_name, user_id, record_id = key
+                del self._cemetery[resource_name][user_id][record_id]
+                del self._cemetery_timestamps[key]
+                count += 1
+        return count
+
     def get_all(self, resource, user_id, filters=None, sorting=None,
-                pagination_rules=None, limit=None, include_deleted=False):
-        records = list(self._store[resource.name][user_id].values())
+                pagination_rules=None, limit=None, include_deleted=False,
+                include_count=True):
+        collection = self._store[resource.name][user_id]
+        cemetery = self._cemetery[resource.name][user_id]
+
+        records_ids = self.extract_records_ids(resource, filters)
+        if records_ids is not None:
+            # Look up targeted records instead of scanning the collection.
+            collection = dict([(i, collection[i]) for i in records_ids
+                               if i in collection])
+            cemetery = dict([(i, cemetery[i]) for i in records_ids
+                             if i in cemetery])
+
+        records = list(collection.values())
 
         deleted = []
         if include_deleted:
-            deleted = list(self._cemetery[resource.name][user_id].values())
+            deleted = list(cemetery.values())
 
         records, count = self.extract_record_set(resource,
                                                  records + deleted,
@@ -0,0 +1,13 @@
+--
+-- Indices for pagination using row-value comparisons on the default sort.
+--
+DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified_epoch;
+CREATE INDEX idx_records_user_id_resource_name_last_modified_epoch
+    ON records(user_id, resource_name, as_epoch(last_modified), id);
+
+DROP INDEX IF EXISTS idx_deleted_user_id_resource_name_last_modified_epoch;
+CREATE INDEX idx_deleted_user_id_resource_name_last_modified_epoch
+    ON deleted(user_id, resource_name, as_epoch(last_modified), id);
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '7');
@@ -0,0 +1,68 @@
+--
+-- Collections timestamps, maintained by triggers on records and deleted.
+--
+CREATE TABLE IF NOT EXISTS timestamps (
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified TIMESTAMP NOT NULL,
+
+    PRIMARY KEY (user_id, resource_name)
+);
+
+-- Backfill from existing records and tombstones.
+INSERT INTO timestamps (user_id, resource_name, last_modified)
+SELECT user_id, resource_name, max(last_modified)
+  FROM (SELECT user_id, resource_name, last_modified FROM records
+         UNION ALL
+        SELECT user_id, resource_name, last_modified FROM deleted) AS a
+ GROUP BY user_id, resource_name;
+
+
+CREATE OR REPLACE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
+RETURNS TIMESTAMP AS $$
+DECLARE
+    ts TIMESTAMP;
+BEGIN
+    SELECT last_modified INTO ts
+      FROM timestamps
+     WHERE user_id = uid
+       AND resource_name = resource;
+
+    -- Collection timestamp or current if empty
+    RETURN coalesce(ts, localtimestamp);
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_timestamp()
+RETURNS trigger AS $$
+DECLARE
+    current TIMESTAMP;
+BEGIN
+    --
+    -- This bumps the current timestamp to 1 msec in the future if the previous
+    -- timestamp is equal to the current one (or higher if was bumped already).
+    --
+    -- The collection timestamp row is locked by the upsert, so that
+    -- concurrent writes on the same collection obtain distinct timestamps.
+    -- See https://github.com/mozilla-services/cliquet/issues/25
+    --
+    -- An empty collection has the current timestamp, hence the first write
+    -- is bumped too.
+    --
+    INSERT INTO timestamps AS t (user_id, resource_name, last_modified)
+    VALUES (NEW.user_id, NEW.resource_name,
+            localtimestamp + INTERVAL '1 milliseconds')
+    ON CONFLICT (user_id, resource_name) DO UPDATE
+       SET last_modified = greatest(localtimestamp,
+                                    t.last_modified + INTERVAL '1 milliseconds')
+    RETURNING last_modified INTO current;
+
+    NEW.last_modified := current;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '8');
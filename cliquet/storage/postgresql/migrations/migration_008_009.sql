@@ -0,0 +1,9 @@
+--
+-- Index for equality filters, as JSONB containment.
+--
+DROP INDEX IF EXISTS idx_records_data_path_ops;
+CREATE INDEX idx_records_data_path_ops
+    ON records USING GIN (data jsonb_path_ops);
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '9');
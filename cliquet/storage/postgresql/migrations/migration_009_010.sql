@@ -0,0 +1,13 @@
+--
+-- Skip the timestamp trigger for tombstones inserted in bulk, since
+-- their timestamps are assigned by the statement.
+--
+DROP TRIGGER IF EXISTS tgr_deleted_last_modified ON deleted;
+
+CREATE TRIGGER tgr_deleted_last_modified
+BEFORE INSERT OR UPDATE ON deleted
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '10');
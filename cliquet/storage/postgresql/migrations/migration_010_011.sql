@@ -0,0 +1,94 @@
+--
+-- Store timestamps as milliseconds epoch integers.
+--
+-- The new columns of records and deleted were filled, and their indices
+-- built, beforehand (see ``PostgreSQL._prepare_migration_010_011``).
+--
+DROP TRIGGER IF EXISTS tgr_records_last_modified_epoch ON records;
+DROP TRIGGER IF EXISTS tgr_deleted_last_modified_epoch ON deleted;
+DROP FUNCTION IF EXISTS sync_last_modified_epoch();
+DROP TRIGGER IF EXISTS tgr_records_last_modified ON records;
+DROP TRIGGER IF EXISTS tgr_deleted_last_modified ON deleted;
+
+-- Former indices are dropped along with the columns.
+ALTER TABLE records DROP COLUMN last_modified;
+ALTER TABLE records RENAME COLUMN last_modified_epoch TO last_modified;
+ALTER TABLE records ALTER COLUMN last_modified SET NOT NULL;
+
+ALTER TABLE deleted DROP COLUMN last_modified;
+ALTER TABLE deleted RENAME COLUMN last_modified_epoch TO last_modified;
+ALTER TABLE deleted ALTER COLUMN last_modified SET NOT NULL;
+
+ALTER INDEX tmp_idx_records_user_id_resource_name_last_modified
+    RENAME TO idx_records_user_id_resource_name_last_modified;
+ALTER INDEX tmp_idx_records_last_modified
+    RENAME TO idx_records_last_modified;
+ALTER INDEX tmp_idx_records_user_id_resource_name_last_modified_id
+    RENAME TO idx_records_user_id_resource_name_last_modified_id;
+ALTER INDEX tmp_idx_deleted_last_modified
+    RENAME TO idx_deleted_last_modified;
+ALTER INDEX tmp_idx_deleted_user_id_resource_name_last_modified_id
+    RENAME TO idx_deleted_user_id_resource_name_last_modified_id;
+
+-- One row per collection, converted at once.
+ALTER TABLE timestamps
+    ALTER COLUMN last_modified TYPE BIGINT USING as_epoch(last_modified);
+
+
+DROP FUNCTION IF EXISTS resource_timestamp(VARCHAR, VARCHAR);
+CREATE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
+RETURNS BIGINT AS $$
+DECLARE
+    ts BIGINT;
+BEGIN
+    SELECT last_modified INTO ts
+      FROM timestamps
+     WHERE user_id = uid
+       AND resource_name = resource;
+
+    -- Collection timestamp or current if empty
+    RETURN coalesce(ts, as_epoch(localtimestamp));
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_timestamp()
+RETURNS trigger AS $$
+DECLARE
+    current BIGINT;
+BEGIN
+    --
+    -- This bumps the current timestamp to 1 msec in the future if the previous
+    -- timestamp is equal to the current one (or higher if was bumped already).
+    --
+    -- The collection timestamp row is locked by the upsert, so that
+    -- concurrent writes on the same collection obtain distinct timestamps.
+    -- See https://github.com/mozilla-services/cliquet/issues/25
+    --
+    -- An empty collection has the current timestamp, hence the first write
+    -- is bumped too.
+    --
+    INSERT INTO timestamps AS t (user_id, resource_name, last_modified)
+    VALUES (NEW.user_id, NEW.resource_name, as_epoch(localtimestamp) + 1)
+    ON CONFLICT (user_id, resource_name) DO UPDATE
+       SET last_modified = greatest(as_epoch(localtimestamp),
+                                    t.last_modified + 1)
+    RETURNING last_modified INTO current;
+
+    NEW.last_modified := current;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tgr_records_last_modified
+BEFORE INSERT OR UPDATE ON records
+FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
+
+CREATE TRIGGER tgr_deleted_last_modified
+BEFORE INSERT OR UPDATE ON deleted
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '11');
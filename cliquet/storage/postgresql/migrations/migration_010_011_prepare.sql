@@ -0,0 +1,41 @@
+--
+-- Add milliseconds epoch timestamp columns, filled by batches (see
+-- ``PostgreSQL._prepare_migration_010_011``), and kept up-to-date meanwhile.
+--
+DO $$
+BEGIN
+    ALTER TABLE records ADD COLUMN last_modified_epoch BIGINT;
+EXCEPTION WHEN duplicate_column THEN NULL;
+END $$;
+
+DO $$
+BEGIN
+    ALTER TABLE deleted ADD COLUMN last_modified_epoch BIGINT;
+EXCEPTION WHEN duplicate_column THEN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION sync_last_modified_epoch()
+RETURNS trigger AS $$
+BEGIN
+    NEW.last_modified_epoch := as_epoch(NEW.last_modified);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers are fired by alphabetical order, hence after the ones assigning
+-- the timestamps.
+DROP TRIGGER IF EXISTS tgr_records_last_modified_epoch ON records;
+CREATE TRIGGER tgr_records_last_modified_epoch
+BEFORE INSERT OR UPDATE ON records
+FOR EACH ROW EXECUTE PROCEDURE sync_last_modified_epoch();
+
+DROP TRIGGER IF EXISTS tgr_deleted_last_modified_epoch ON deleted;
+CREATE TRIGGER tgr_deleted_last_modified_epoch
+BEFORE INSERT OR UPDATE ON deleted
+FOR EACH ROW EXECUTE PROCEDURE sync_last_modified_epoch();
+
+-- Filling the new column must not bump the records timestamps.
+DROP TRIGGER IF EXISTS tgr_records_last_modified ON records;
+CREATE TRIGGER tgr_records_last_modified
+BEFORE INSERT OR UPDATE OF data ON records
+FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
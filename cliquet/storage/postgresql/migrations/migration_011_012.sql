@@ -0,0 +1,135 @@
+--
+-- Key records and tombstones by collection integer ids.
+--
+-- Tables are rebuilt within this transaction (and partitioned again
+-- afterwards, if configured), hence writes are blocked meanwhile.
+--
+CREATE TABLE collections (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified BIGINT,
+
+    UNIQUE (user_id, resource_name)
+);
+
+INSERT INTO collections (user_id, resource_name, last_modified)
+SELECT user_id, resource_name, last_modified
+  FROM timestamps;
+
+-- Every collection should have a timestamp already, but no row is left out.
+INSERT INTO collections (user_id, resource_name, last_modified)
+SELECT user_id, resource_name, max(last_modified)
+  FROM (SELECT user_id, resource_name, last_modified FROM records
+         UNION ALL
+        SELECT user_id, resource_name, last_modified FROM deleted) AS rows
+ GROUP BY user_id, resource_name
+ON CONFLICT (user_id, resource_name) DO NOTHING;
+
+DROP TABLE timestamps;
+
+
+-- Rows are copied before creating indices and triggers, timestamps are kept.
+CREATE TABLE records_new (
+    id TEXT NOT NULL,
+    collection_id BIGINT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified BIGINT NOT NULL,
+    data JSONB NOT NULL DEFAULT '{}'::JSONB
+);
+INSERT INTO records_new (id, collection_id, resource_name, last_modified,
+                         data)
+SELECT r.id, c.id, r.resource_name, r.last_modified, r.data
+  FROM records AS r
+  JOIN collections AS c
+    ON c.user_id = r.user_id
+   AND c.resource_name = r.resource_name;
+
+-- Former indices and triggers are dropped along with the tables.
+DROP TABLE records;
+ALTER TABLE records_new RENAME TO records;
+ALTER TABLE records ADD PRIMARY KEY (collection_id, id);
+CREATE INDEX idx_records_last_modified ON records(last_modified);
+CREATE INDEX idx_records_collection_id_last_modified_id
+    ON records(collection_id, last_modified, id);
+CREATE INDEX idx_records_data_path_ops
+    ON records USING GIN (data jsonb_path_ops);
+
+
+CREATE TABLE deleted_new (
+    id TEXT NOT NULL,
+    collection_id BIGINT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified BIGINT NOT NULL
+);
+INSERT INTO deleted_new (id, collection_id, resource_name, last_modified)
+SELECT d.id, c.id, d.resource_name, d.last_modified
+  FROM deleted AS d
+  JOIN collections AS c
+    ON c.user_id = d.user_id
+   AND c.resource_name = d.resource_name;
+
+DROP TABLE deleted;
+ALTER TABLE deleted_new RENAME TO deleted;
+ALTER TABLE deleted ADD PRIMARY KEY (collection_id, id);
+CREATE INDEX idx_deleted_last_modified ON deleted(last_modified);
+CREATE INDEX idx_deleted_collection_id_last_modified_id
+    ON deleted(collection_id, last_modified, id);
+
+
+CREATE OR REPLACE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
+RETURNS BIGINT AS $$
+DECLARE
+    ts BIGINT;
+BEGIN
+    SELECT last_modified INTO ts
+      FROM collections
+     WHERE user_id = uid
+       AND resource_name = resource;
+
+    -- Collection timestamp or current if empty
+    RETURN coalesce(ts, as_epoch(localtimestamp));
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION bump_timestamp()
+RETURNS trigger AS $$
+DECLARE
+    current BIGINT;
+BEGIN
+    --
+    -- This bumps the current timestamp to 1 msec in the future if the previous
+    -- timestamp is equal to the current one (or higher if was bumped already).
+    --
+    -- The collection row is locked by the update, so that concurrent writes
+    -- on the same collection obtain distinct timestamps.
+    -- See https://github.com/mozilla-services/cliquet/issues/25
+    --
+    -- An empty collection has the current timestamp, hence the first write
+    -- is bumped too.
+    --
+    UPDATE collections
+       SET last_modified = greatest(as_epoch(localtimestamp),
+                                    coalesce(last_modified,
+                                             as_epoch(localtimestamp)) + 1)
+     WHERE id = NEW.collection_id
+    RETURNING last_modified INTO current;
+
+    NEW.last_modified := current;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tgr_records_last_modified
+BEFORE INSERT OR UPDATE ON records
+FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
+
+CREATE TRIGGER tgr_deleted_last_modified
+BEFORE INSERT OR UPDATE ON deleted
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '12');
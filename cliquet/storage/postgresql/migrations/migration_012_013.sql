@@ -0,0 +1,14 @@
+--
+-- Skip the timestamp trigger for records written in bulk, since their
+-- timestamps are assigned by the statement. Updated records are given the
+-- timestamp of the proposed row, bumped once on insert.
+--
+DROP TRIGGER IF EXISTS tgr_records_last_modified ON records;
+
+CREATE TRIGGER tgr_records_last_modified
+BEFORE INSERT OR UPDATE ON records
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
+
+-- Bump storage schema version.
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '13');
@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_UNKNOWN)
+from psycopg2.pool import PoolError
+
+
+class QueuePool(object):
+    """Thread-safe pool of connections to a single database.
+
+    Unlike :class:`psycopg2.pool.ThreadedConnectionPool`, connections are
+    opened on demand from `minconn` up to `maxconn`, and a caller waits up to
+    `timeout` seconds for a connection to be released when the pool is
+    exhausted.
+
+    Idle connections are closed after `max_idle` seconds (as long as more
+    than `minconn` are opened), and any connection is closed after `max_age`
+    seconds of existence. A value of ``0`` disables these limits.
+    """
+    def __init__(self, minconn, maxconn, timeout=30, max_idle=0, max_age=0,
+                 *args, **kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_age = max_age
+
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Condition()
+        # Released connections with their time of release, most recent last.
+        self._idle = deque()
+        # Time of creation of every opened connection.
+        self._opened = {}
+        self._creating = 0
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.exhausted = 0
+        self.recycled = 0
+
+        for i in range(self.minconn):
+            conn = self._connect()
+            self._idle.append((conn, time.time()))
+
+    @property
+    def size(self):
+        """Number of connections opened (or being opened)."""
+        return len(self._opened) + self._creating
+
+    def stats(self):
+        """Return the pool usage counters, for monitoring purposes.
+
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(size=self.size,
+                        idle=len(self._idle),
+                        checkouts=self.checkouts,
+                        waits=self.waits,
+                        wait_time=self.wait_time,
+                        exhausted=self.exhausted,
+                        recycled=self.recycled)
+
+    def _connect(self):
+        conn = psycopg2.connect(*self._args, **self._kwargs)
+        self._opened[conn] = time.time()
+        return conn
+
+    def _discard(self, conn):
+        self._opened.pop(conn, None)
+        if not conn.closed:
+            conn.close()
+
+    def _is_expired(self, conn, now):
+        created = self._opened.get(conn, now)
+        return self.max_age > 0 and now - created > self.max_age
+
+    def _recycle(self, now):
+        """Close expired connections among idle ones."""
+        kept = deque()
+        while self._idle:
+            conn, released = self._idle.popleft()
+            idle_too_long = (self.max_idle > 0 and
+                             now - released > self.max_idle and
+                             self.size > self.minconn)
+            if idle_too_long or self._is_expired(conn, now):
+                self._discard(conn)
+                self.recycled += 1
+            else:
+                kept.append((conn, released))
+        self._idle = kept
+
+    def getconn(self):
+        """Return an idle connection, open a new one if the pool is not full,
+        or wait for one to be released.
+
+        :raises: :exc:`psycopg2.pool.PoolError` if no connection could be
+            obtained within the configured timeout.
+        """
+        start = time.time()
+        waited = False
+        with self._lock:
+            while True:
+                self._recycle(time.time())
+                if self._idle:
+                    conn, _ = self._idle.pop()
+                    break
+                if self.size < self.maxconn:
+                    conn = None
+                    self._creating += 1
+                    break
+                remaining = start + self.timeout - time.time()
+                if remaining <= 0:
+                    self.exhausted += 1
+                    raise PoolError("connection pool exhausted")
+                waited = True
+                self._lock.wait(remaining)
+
+            if waited:
+                self.waits += 1
+                self.wait_time += time.time() - start
+            if conn is not None:
+                self.checkouts += 1
+
+        if conn is None:
+            # Open the connection outside the lock, it may take a while.
+            try:
+                conn = psycopg2.connect(*self._args, **self._kwargs)
+            finally:
+                with self._lock:
+                    self._creating -= 1
+                    if conn is not None:
+                        self._opened[conn] = time.time()
+                        self.checkouts += 1
+                    self._lock.notify()
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Release the specified connection, and close it if `close` is
+        ``True`` or if it reached its maximum age.
+        """
+        if not close and not conn.closed:
+            # Like psycopg2 pools, abort pending transactions, and drop
+            # connections to a lost server.
+            status = conn.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+
+        now = time.time()
+        with self._lock:
+            if close or conn.closed:
+                self._discard(conn)
+            elif self._is_expired(conn, now):
+                self._discard(conn)
+                self.recycled += 1
+            else:
+                self._idle.append((conn, now))
+            self._lock.notify()
+
+    def closeall(self):
+        """Close every connection of the pool."""
+        with self._lock:
+            for conn in list(self._opened.keys()):
+                self._discard(conn)
+            self._idle.clear()
+            self._lock.notify_all()
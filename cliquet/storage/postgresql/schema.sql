@@ -8,30 +8,52 @@ END;
 $$ LANGUAGE plpgsql
 IMMUTABLE;
 
+--
+-- Collections of records of a resource for a user. Records are keyed by
+-- collection integer ids, instead of repeating their user id and resource
+-- name, so that their indices are smaller.
+--
+CREATE TABLE IF NOT EXISTS collections (
+    id BIGSERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+
+    -- Collection timestamp, maintained by triggers on records and deleted.
+    -- Empty until the first write.
+    last_modified BIGINT,
+
+    UNIQUE (user_id, resource_name)
+);
+
+
 --
 -- Actual records
 --
 CREATE TABLE IF NOT EXISTS records (
     id TEXT NOT NULL,
-    user_id TEXT NOT NULL,
+    collection_id BIGINT NOT NULL,
+    -- Serves the resources partial indices and partitions.
     resource_name TEXT NOT NULL,
 
-    -- Timestamp is relevant because adequate semantically.
-    -- Since the HTTP API manipulates integers, it could make sense
-    -- to replace the timestamp columns type by integer.
-    last_modified TIMESTAMP NOT NULL,
+    -- Milliseconds epoch integer, as manipulated by the HTTP API.
+    last_modified BIGINT NOT NULL,
 
     -- JSONB, 2x faster than JSON.
     data JSONB NOT NULL DEFAULT '{}'::JSONB,
 
-    PRIMARY KEY (id, user_id, resource_name)
+    PRIMARY KEY (collection_id, id)
 );
 
-DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified;
-CREATE UNIQUE INDEX idx_records_user_id_resource_name_last_modified
-    ON records(user_id, resource_name, last_modified DESC);
-DROP INDEX IF EXISTS idx_records_last_modified_epoch;
-CREATE INDEX idx_records_last_modified_epoch ON records(as_epoch(last_modified));
+DROP INDEX IF EXISTS idx_records_last_modified;
+CREATE INDEX idx_records_last_modified ON records(last_modified);
+-- Serves pagination on the default sort, as row-value comparisons.
+DROP INDEX IF EXISTS idx_records_collection_id_last_modified_id;
+CREATE INDEX idx_records_collection_id_last_modified_id
+    ON records(collection_id, last_modified, id);
+-- Serves equality filters, as JSONB containment.
+DROP INDEX IF EXISTS idx_records_data_path_ops;
+CREATE INDEX idx_records_data_path_ops
+    ON records USING GIN (data jsonb_path_ops);
 
 
 --
@@ -39,46 +61,35 @@ CREATE INDEX idx_records_last_modified_epoch ON records(as_epoch(last_modified))
 --
 CREATE TABLE IF NOT EXISTS deleted (
     id TEXT NOT NULL,
-    user_id TEXT NOT NULL,
+    collection_id BIGINT NOT NULL,
     resource_name TEXT NOT NULL,
-    last_modified TIMESTAMP NOT NULL,
+    last_modified BIGINT NOT NULL,
 
-    PRIMARY KEY (id, user_id, resource_name)
+    PRIMARY KEY (collection_id, id)
 );
-DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified;
-CREATE UNIQUE INDEX idx_records_user_id_resource_name_last_modified
-    ON records(user_id, resource_name, last_modified DESC);
-DROP INDEX IF EXISTS idx_deleted_last_modified_epoch;
-CREATE INDEX idx_deleted_last_modified_epoch ON deleted(as_epoch(last_modified));
+DROP INDEX IF EXISTS idx_deleted_last_modified;
+CREATE INDEX idx_deleted_last_modified ON deleted(last_modified);
+DROP INDEX IF EXISTS idx_deleted_collection_id_last_modified_id;
+CREATE INDEX idx_deleted_collection_id_last_modified_id
+    ON deleted(collection_id, last_modified, id);
 
 
 --
 -- Helper that returns the current collection timestamp.
 --
-CREATE OR REPLACE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
-RETURNS TIMESTAMP AS $$
+DROP FUNCTION IF EXISTS resource_timestamp(VARCHAR, VARCHAR);
+CREATE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
+RETURNS BIGINT AS $$
 DECLARE
-    ts_records TIMESTAMP;
-    ts_deleted TIMESTAMP;
+    ts BIGINT;
 BEGIN
-    --
-    -- This is fast because an index was created for ``user_id``,
-    -- ``resource_name``, and ``last_modified`` with descending sorting order.
-    --
-    SELECT last_modified INTO ts_records
-      FROM records
+    SELECT last_modified INTO ts
+      FROM collections
      WHERE user_id = uid
-       AND resource_name = resource
-     ORDER BY last_modified DESC LIMIT 1;
+       AND resource_name = resource;
 
-    SELECT last_modified INTO ts_deleted
-      FROM deleted
-     WHERE user_id = uid
-       AND resource_name = resource
-     ORDER BY last_modified DESC LIMIT 1;
-
-    -- Latest of records/deleted or current if empty
-    RETURN coalesce(greatest(ts_deleted, ts_records), localtimestamp);
+    -- Collection timestamp or current if empty
+    RETURN coalesce(ts, as_epoch(localtimestamp));
 END;
 $$ LANGUAGE plpgsql;
 
@@ -91,24 +102,25 @@ DROP TRIGGER IF EXISTS tgr_deleted_last_modified ON deleted;
 CREATE OR REPLACE FUNCTION bump_timestamp()
 RETURNS trigger AS $$
 DECLARE
-    previous TIMESTAMP;
-    current TIMESTAMP;
+    current BIGINT;
 BEGIN
     --
     -- This bumps the current timestamp to 1 msec in the future if the previous
     -- timestamp is equal to the current one (or higher if was bumped already).
     --
-    -- If a bunch of requests from the same user on the same collection
-    -- arrive in the same millisecond, the unicity constraint can raise
-    -- an error (operation is cancelled).
+    -- The collection row is locked by the update, so that concurrent writes
+    -- on the same collection obtain distinct timestamps.
     -- See https://github.com/mozilla-services/cliquet/issues/25
     --
-    previous := resource_timestamp(NEW.user_id, NEW.resource_name);
-    current := localtimestamp;
-
-    IF previous >= current THEN
-        current := previous + INTERVAL '1 milliseconds';
-    END IF;
+    -- An empty collection has the current timestamp, hence the first write
+    -- is bumped too.
+    --
+    UPDATE collections
+       SET last_modified = greatest(as_epoch(localtimestamp),
+                                    coalesce(last_modified,
+                                             as_epoch(localtimestamp)) + 1)
+     WHERE id = NEW.collection_id
+    RETURNING last_modified INTO current;
 
     NEW.last_modified := current;
 
@@ -116,13 +128,17 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Records and tombstones written in bulk are given their timestamps by the
+-- statement.
 CREATE TRIGGER tgr_records_last_modified
 BEFORE INSERT OR UPDATE ON records
-FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
 
 CREATE TRIGGER tgr_deleted_last_modified
 BEFORE INSERT OR UPDATE ON deleted
-FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
 
 --
 -- Metadata table
@@ -136,4 +152,4 @@ INSERT INTO metadata (name, value) VALUES ('created_at', NOW()::TEXT);
 
 -- Set storage schema version.
 -- Should match ``cliquet.storage.postgresql.PostgreSQL.schema_version``
-INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '6');
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '13');
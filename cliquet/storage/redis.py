@@ -1,12 +1,187 @@
 from __future__ import absolute_import
+import itertools
+import warnings
+import zlib
 from functools import wraps
 
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
 import redis
+import six
+from pyramid.exceptions import ConfigurationError
+from pyramid.settings import asbool
 from six.moves.urllib import parse as urlparse
 
 from cliquet import utils
 from cliquet.storage import exceptions
 from cliquet.storage.memory import MemoryBasedStorage
+from cliquet.utils import COMPARISON
+
+
+# Reserve ``count`` consecutive timestamps for the collection, based on the
+# current time given by the client, and return the first one.
+BUMP_TIMESTAMP_LUA = """
+local function bump_timestamp(key, now, count)
+    local previous = tonumber(redis.call('GET', key))
+    local current = now
+    if previous and previous >= current then
+        current = previous + 1
+    end
+    redis.call('SET', key, current + count - 1)
+    return current
+end
+"""
+
+# Unique fields values are indexed in a hash per field and collection,
+# which maps ``v:{value}`` to the record id, and ``i:{id}`` to its value.
+# Its ``indexed`` marker keeps it from being removed once empty, since only
+# existing hashes are complete.
+# Release the value held by the record, and hold the new one (if any).
+SET_UNIQUE_VALUE_LUA = """
+local function set_unique_value(key, id, value)
+    local previous = redis.call('HGET', key, 'i:' .. id)
+    if previous then
+        if redis.call('HGET', key, 'v:' .. previous) == id then
+            redis.call('HDEL', key, 'v:' .. previous)
+        end
+        redis.call('HDEL', key, 'i:' .. id)
+    end
+    if value ~= '' then
+        redis.call('HMSET', key, 'v:' .. value, id, 'i:' .. id, value)
+    end
+end
+"""
+
+BUMP_SCRIPT = BUMP_TIMESTAMP_LUA + """
+return bump_timestamp(KEYS[1], tonumber(ARGV[1]), tonumber(ARGV[2]))
+"""
+
+# KEYS: collection timestamp, records ids, unique fields hashes, then the
+# records keys (or the collection hash).
+# ARGV: current time, If-Unmodified-Since timestamp (or empty), number of
+# unique fields, ``1`` if records are stored in a hash per collection, ``1``
+# if unicity was checked by the caller for missing unique fields hashes, then
+# for each record its id, its encoded value, and its encoded unique fields
+# values (or empty).
+WRITE_SCRIPT = BUMP_TIMESTAMP_LUA + SET_UNIQUE_VALUE_LUA + """
+local unique_count = tonumber(ARGV[3])
+local hashed = ARGV[4] == '1'
+local checked = ARGV[5] == '1'
+local width = 2 + unique_count
+local count = (#ARGV - 5) / width
+local unmodified_since = tonumber(ARGV[2])
+
+local function arg(i, offset)
+    return ARGV[5 + (i - 1) * width + offset]
+end
+
+if unmodified_since then
+    for i = 1, count do
+        local id = arg(i, 1)
+        local existing = tonumber(redis.call('ZSCORE', KEYS[2], id))
+        if existing and existing > unmodified_since then
+            return {'modified', id}
+        end
+    end
+end
+
+-- Unique fields hashes are complete once built, or if the collection has
+-- no records yet. Otherwise, they are left aside if the caller checked
+-- unicity, and reported as missing if not.
+local empty = redis.call('ZCARD', KEYS[2]) == 0
+local indexed = {}
+for j = 1, unique_count do
+    if redis.call('EXISTS', KEYS[2 + j]) == 1 then
+        indexed[j] = true
+    elseif empty then
+        redis.call('HSET', KEYS[2 + j], 'indexed', '1')
+        indexed[j] = true
+    elseif not checked then
+        return {'unindexed', j}
+    end
+end
+
+-- Unique values cannot be held by other records than those of the batch,
+-- nor by several records of the batch.
+local batch = {}
+for i = 1, count do
+    batch[arg(i, 1)] = true
+end
+for j = 1, unique_count do
+    local claimed = {}
+    for i = 1, count do
+        local id, value = arg(i, 1), arg(i, 2 + j)
+        if value ~= '' then
+            if claimed[value] and claimed[value] ~= id then
+                return {'conflict', j, claimed[value]}
+            end
+            claimed[value] = id
+            local owner = indexed[j] and
+                          redis.call('HGET', KEYS[2 + j], 'v:' .. value)
+            if owner and owner ~= id and not batch[owner] then
+                return {'conflict', j, owner}
+            end
+        end
+    end
+end
+
+local current = bump_timestamp(KEYS[1], tonumber(ARGV[1]), count)
+for i = 1, count do
+    local id = arg(i, 1)
+    if hashed then
+        redis.call('HSET', KEYS[3 + unique_count], id, arg(i, 2))
+    else
+        redis.call('SET', KEYS[2 + unique_count + i], arg(i, 2))
+    end
+    redis.call('ZADD', KEYS[2], current + i - 1, id)
+    for j = 1, unique_count do
+        if indexed[j] then
+            set_unique_value(KEYS[2 + j], id, arg(i, 2 + j))
+        end
+    end
+end
+return {'ok', current}
+"""
+
+# KEYS: collection timestamp, records ids, deleted records ids, unique fields
+# hashes, then the records keys (or the collection hash).
+# ARGV: current time, If-Unmodified-Since timestamp (or empty), number of
+# unique fields, ``1`` if records are stored in a hash per collection, then
+# the records ids.
+DELETE_SCRIPT = BUMP_TIMESTAMP_LUA + SET_UNIQUE_VALUE_LUA + """
+local unique_count = tonumber(ARGV[3])
+local hashed = ARGV[4] == '1'
+local count = #ARGV - 4
+local unmodified_since = tonumber(ARGV[2])
+for i = 1, count do
+    local id = ARGV[4 + i]
+    local existing = tonumber(redis.call('ZSCORE', KEYS[2], id))
+    if not existing then
+        return {'missing', id}
+    end
+    if unmodified_since and existing > unmodified_since then
+        return {'modified', id}
+    end
+end
+local current = bump_timestamp(KEYS[1], tonumber(ARGV[1]), count)
+for i = 1, count do
+    local id = ARGV[4 + i]
+    if hashed then
+        redis.call('HDEL', KEYS[4 + unique_count], id)
+    else
+        redis.call('DEL', KEYS[3 + unique_count + i])
+    end
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[3], current + i - 1, id)
+    for j = 1, unique_count do
+        set_unique_value(KEYS[3 + j], id, '')
+    end
+end
+return {'ok', current}
+"""
 
 
 def wrap_redis_error(func):
@@ -19,6 +194,54 @@ def wrap_redis_error(func):
     return wrapped
 
 
+class JSONCodec(object):
+    """Encode records as JSON text."""
+    def __init__(self, settings):
+        pass
+
+    def encode(self, record):
+        return utils.json.dumps(record)
+
+    def decode(self, encoded):
+        return utils.json.loads(encoded.decode('utf-8'))
+
+
+class MsgpackCodec(JSONCodec):
+    """Encode records with MessagePack, and compress them with zlib when
+    larger than ``cliquet.storage_compression_threshold`` bytes (0 to never
+    compress).
+
+    Encoded values start with a marker byte, which JSON text never starts
+    with, so that records encoded with :class:`JSONCodec` remain readable.
+    """
+    PACKED = b'\x01'
+    COMPRESSED = b'\x02'
+
+    def __init__(self, settings):
+        super(MsgpackCodec, self).__init__(settings)
+        if msgpack is None:
+            error_msg = ('MessagePack codec requires the msgpack package, '
+                         'install cliquet[msgpack].')
+            raise ConfigurationError(error_msg)
+        threshold = settings['cliquet.storage_compression_threshold']
+        self.compression_threshold = int(threshold or 0)
+
+    def encode(self, record):
+        packed = msgpack.packb(record, use_bin_type=True)
+        threshold = self.compression_threshold
+        if threshold and len(packed) > threshold:
+            return self.COMPRESSED + zlib.compress(packed)
+        return self.PACKED + packed
+
+    def decode(self, encoded):
+        marker, payload = encoded[:1], encoded[1:]
+        if marker == self.COMPRESSED:
+            payload = zlib.decompress(payload)
+        elif marker != self.PACKED:
+            return super(MsgpackCodec, self).decode(encoded)
+        return msgpack.unpackb(payload, raw=False)
+
+
 class Redis(MemoryBasedStorage):
     """Storage backend implementation using Redis.
 
@@ -27,6 +250,14 @@ class Redis(MemoryBasedStorage):
         Useful for very low server load, but won't scale since records sorting
         and filtering are performed in memory.
 
+        Only the synchronization queries (filtered on timestamps and sorted
+        by ``last_modified``) are served by an index, and fetch no more
+        records than the requested page.
+
+    Writes are performed by Lua scripts, so that records are stored, their
+    timestamps assigned and their unique fields checked atomically, in a
+    single round trip.
+
     Enable in configuration::
 
         cliquet.storage_backend = cliquet.storage.redis
@@ -38,20 +269,254 @@ class Redis(MemoryBasedStorage):
     A threaded connection pool is enabled by default::
 
         cliquet.storage_pool_size = 50
+
+    *(Optional)* Records can be stored in a hash per collection, instead of
+    a key per record, which uses much less memory for large collections::
+
+        cliquet.storage_hash_per_collection = true
+
+    Existing records are converted to the configured layout by the
+    ``cliquet migrate`` command.
+
+    *(Optional)* Records can be encoded with MessagePack instead of JSON
+    (requires the ``msgpack`` package), and compressed when larger than a
+    number of bytes::
+
+        cliquet.storage_codec = cliquet.storage.redis.MsgpackCodec
+        cliquet.storage_compression_threshold = 1024
+
+    Records encoded in JSON remain readable, and are converted when written.
     """
 
     def __init__(self, *args, **kwargs):
         super(Redis, self).__init__(*args, **kwargs)
+        self._hash_per_collection = kwargs.pop('hash_per_collection', False)
+        self._codec = kwargs.pop('codec', None) or JSONCodec({})
         maxconn = kwargs.pop('max_connections')
         connection_pool = redis.BlockingConnectionPool(max_connections=maxconn)
         self._client = redis.StrictRedis(connection_pool=connection_pool,
                                          **kwargs)
+        # Scripts are loaded on first use, and run with EVALSHA.
+        self._bump_script = self._client.register_script(BUMP_SCRIPT)
+        self._write_script = self._client.register_script(WRITE_SCRIPT)
+        self._delete_script = self._client.register_script(DELETE_SCRIPT)
 
     def _encode(self, record):
-        return utils.json.dumps(record)
+        return self._codec.encode(record)
 
     def _decode(self, record):
-        return utils.json.loads(record.decode('utf-8'))
+        return self._codec.decode(record)
+
+    def _timestamp_key(self, resource, user_id):
+        return '{0}.{1}.timestamp'.format(resource.name, user_id)
+
+    def _ids_key(self, resource, user_id, suffix='records'):
+        """Key of the sorted set of records (or tombstones) ids, scored by
+        timestamps.
+        """
+        return '{0}.{1}.{2}'.format(resource.name, user_id, suffix)
+
+    def _record_key(self, resource, user_id, record_id):
+        return '{0}.{1}.{2}.records'.format(resource.name, user_id, record_id)
+
+    def _hash_key(self, resource, user_id):
+        """Key of the hash of the collection records, when they are stored in
+        a hash per collection.
+        """
+        return '{0}.{1}.records.hash'.format(resource.name, user_id)
+
+    def _records_keys(self, resource, user_id, records_ids):
+        """Keys the specified records are stored in.
+        """
+        if self._hash_per_collection:
+            return [self._hash_key(resource, user_id)]
+        return [self._record_key(resource, user_id, record_id)
+                for record_id in records_ids]
+
+    def _unique_key(self, resource, user_id, field):
+        """Key of the hash of the unique `field` values of the collection.
+        """
+        return '{0}.{1}.{2}.unique'.format(resource.name, user_id, field)
+
+    def _encode_unique_value(self, value):
+        if value is None:
+            # None values cannot be considered unique.
+            return ''
+        return utils.json.dumps(value, sort_keys=True)
+
+    @wrap_redis_error
+    def initialize_schema(self):
+        """Convert the sets of records and tombstones ids, used by previous
+        versions, into sorted sets scored by timestamps. Tombstones are now
+        only kept in those sorted sets.
+        """
+        from cliquet.resource import BaseResource
+
+        for suffix in ('records', 'deleted'):
+            keys = self._client.scan_iter(match='*.{0}'.format(suffix))
+            for key in keys:
+                if self._client.type(key) != b'set':
+                    continue
+                prefix = key.decode('utf-8')[:-len(suffix) - 1]
+                ids = [_id.decode('utf-8')
+                       for _id in self._client.smembers(key)]
+                items_keys = ['{0}.{1}.{2}'.format(prefix, _id, suffix)
+                              for _id in ids]
+                encoded_results = self._client.mget(items_keys)
+                scores = []
+                for _id, encoded in zip(ids, encoded_results):
+                    if encoded is None:
+                        continue
+                    item = self._decode(encoded)
+                    scores.extend([item[BaseResource.modified_field], _id])
+
+                with self._client.pipeline() as multi:
+                    multi.delete(key)
+                    if scores:
+                        multi.zadd(key, *scores)
+                    if suffix == 'deleted' and items_keys:
+                        multi.delete(*items_keys)
+                    multi.execute()
+
+        # Convert records to the configured layout.
+        for key in self._client.scan_iter(match='*.records'):
+            if self._client.type(key) != b'zset':
+                continue
+            prefix = key.decode('utf-8')[:-len('.records')]
+            if self._hash_per_collection:
+                self._move_records_to_hash(prefix)
+            else:
+                self._move_records_to_keys(prefix)
+
+    def _move_records_to_hash(self, prefix, batch_size=1000):
+        ids_key = '{0}.records'.format(prefix)
+        hash_key = '{0}.records.hash'.format(prefix)
+        ids = [_id.decode('utf-8')
+               for _id in self._client.zrange(ids_key, 0, -1)]
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            records_keys = ['{0}.{1}.records'.format(prefix, _id)
+                            for _id in batch]
+            encoded_results = self._client.mget(records_keys)
+            mapping = dict([(_id, encoded)
+                            for _id, encoded in zip(batch, encoded_results)
+                            if encoded is not None])
+            if not mapping:
+                continue
+            with self._client.pipeline() as multi:
+                multi.hmset(hash_key, mapping)
+                multi.delete(*records_keys)
+                multi.execute()
+
+    def _move_records_to_keys(self, prefix, batch_size=1000):
+        hash_key = '{0}.records.hash'.format(prefix)
+        mapping = {}
+        items = self._client.hscan_iter(hash_key, count=batch_size)
+        for _id, encoded in items:
+            record_key = '{0}.{1}.records'.format(prefix, _id.decode('utf-8'))
+            mapping[record_key] = encoded
+            if len(mapping) >= batch_size:
+                self._client.mset(mapping)
+                mapping = {}
+        if mapping:
+            self._client.mset(mapping)
+        self._client.delete(hash_key)
+
+    def _iter_collection(self, prefix, batch_size=1000):
+        """Iterate the ids and encoded records of the collection with the
+        specified keys prefix.
+        """
+        if self._hash_per_collection:
+            hash_key = '{0}.records.hash'.format(prefix)
+            items = self._client.hscan_iter(hash_key, count=batch_size)
+            for _id, encoded in items:
+                yield _id.decode('utf-8'), encoded
+            return
+
+        ids_key = '{0}.records'.format(prefix)
+        ids = [_id.decode('utf-8')
+               for _id in self._client.zrange(ids_key, 0, -1)]
+        for i in range(0, len(ids), batch_size):
+            batch = ids[i:i + batch_size]
+            records_keys = ['{0}.{1}.records'.format(prefix, _id)
+                            for _id in batch]
+            encoded_results = self._client.mget(records_keys)
+            for _id, encoded in zip(batch, encoded_results):
+                if encoded is not None:
+                    yield _id, encoded
+
+    @wrap_redis_error
+    def create_indices(self, resource_name, mapping):
+        """Build the hashes of unique fields values, for every collection of
+        this resource. The ones of fields that are not unique anymore are
+        removed.
+        """
+        unique_fields = mapping.get_option('unique_fields')
+
+        suffixes = tuple(['.{0}.unique'.format(field)
+                          for field in unique_fields])
+        pattern = '{0}.*.unique'.format(resource_name)
+        for key in self._client.scan_iter(match=pattern):
+            if not key.decode('utf-8').endswith(suffixes):
+                self._client.delete(key)
+
+        if not unique_fields:
+            return
+
+        pattern = '{0}.*.records'.format(resource_name)
+        for key in self._client.scan_iter(match=pattern):
+            if self._client.type(key) != b'zset':
+                continue
+            prefix = key.decode('utf-8')[:-len('.records')]
+            self._build_unique_hashes(prefix, unique_fields)
+
+    def _build_unique_hashes(self, prefix, unique_fields):
+        """Build the hashes of unique fields values of the collection with
+        the specified keys prefix.
+
+        They are built under temporary keys, and renamed into place if the
+        collection was not written meanwhile (i.e. its timestamp did not
+        change). Otherwise, they are built again. Current hashes thus keep
+        enforcing unicity until then.
+        """
+        timestamp_key = '{0}.timestamp'.format(prefix)
+        while True:
+            with self._client.pipeline() as multi:
+                multi.watch(timestamp_key)
+                hashes = self._collect_unique_values(prefix, unique_fields)
+                for unique_key, mapping in hashes.items():
+                    temporary_key = '{0}.tmp'.format(unique_key)
+                    self._client.delete(temporary_key)
+                    self._client.hmset(temporary_key, mapping)
+
+                multi.multi()
+                for unique_key in hashes.keys():
+                    multi.rename('{0}.tmp'.format(unique_key), unique_key)
+                try:
+                    multi.execute()
+                    return
+                except redis.WatchError:
+                    continue
+
+    def _collect_unique_values(self, prefix, unique_fields):
+        """Return the contents of the hashes of unique fields values of the
+        collection with the specified keys prefix, by key.
+        """
+        hashes = {}
+        for field in unique_fields:
+            unique_key = '{0}.{1}.unique'.format(prefix, field)
+            hashes[unique_key] = {'indexed': '1'}
+
+        for _id, encoded in self._iter_collection(prefix):
+            record = self._decode(encoded)
+            for field in unique_fields:
+                value = self._encode_unique_value(record.get(field))
+                if value == '':
+                    continue
+                unique_key = '{0}.{1}.unique'.format(prefix, field)
+                hashes[unique_key].update({'v:' + value: _id,
+                                           'i:' + _id: value})
+        return hashes
 
     @wrap_redis_error
     def flush(self):
@@ -59,161 +524,293 @@ class Redis(MemoryBasedStorage):
 
     @wrap_redis_error
     def collection_timestamp(self, resource, user_id):
-        timestamp = self._client.get(
-            '{0}.{1}.timestamp'.format(resource.name, user_id))
+        timestamp = self._client.get(self._timestamp_key(resource, user_id))
         if timestamp:
             return int(timestamp)
         return self._bump_timestamp(resource, user_id)
 
     @wrap_redis_error
-    def _bump_timestamp(self, resource, user_id):
-        key = '{0}.{1}.timestamp'.format(resource.name, user_id)
-        while 1:
-            with self._client.pipeline() as pipe:
-                try:
-                    pipe.watch(key)
-                    previous = pipe.get(key)
-                    pipe.multi()
-                    current = utils.msec_time()
-
-                    if previous and int(previous) >= current:
-                        current = int(previous) + 1
-                    pipe.set(key, current)
-                    pipe.execute()
-                    return current
-                except redis.WatchError:  # pragma: no cover
-                    # Our timestamp has been modified by someone else, let's
-                    # retry.
-                    # XXX: untested.
-                    continue
+    def _bump_timestamp(self, resource, user_id, count=1):
+        keys = [self._timestamp_key(resource, user_id)]
+        return self._bump_script(keys=keys, args=[utils.msec_time(), count])
+
+    def _run_script(self, script, keys, args):
+        """Run the specified write script, and return its reply.
+        """
+        reply = script(keys=keys, args=args)
+        status, value = reply[0], reply[-1]
+        if status == b'missing':
+            raise exceptions.RecordNotFoundError(value.decode('utf-8'))
+        if status == b'modified':
+            raise exceptions.ModifiedMeanwhileError(value.decode('utf-8'))
+        return reply
+
+    def _write(self, resource, user_id, records, if_unmodified_since=None):
+        """Store the specified records, with their ids assigned, and give
+        them consecutive timestamps.
+
+        Timestamps are not part of the stored records, they are only kept as
+        the scores of the sorted set of ids. Unicity of the resource unique
+        fields is enforced by the script, using the hashes of their values.
+        If some are missing, until the ``cliquet migrate`` command builds
+        them, existing records are checked before the write instead.
+        """
+        unique_fields = resource.mapping.get_option('unique_fields')
+        keys = [self._timestamp_key(resource, user_id),
+                self._ids_key(resource, user_id)]
+        keys += [self._unique_key(resource, user_id, field)
+                 for field in unique_fields]
+        records_ids = [r[resource.id_field] for r in records]
+        keys += self._records_keys(resource, user_id, records_ids)
+        args = [utils.msec_time(),
+                '' if if_unmodified_since is None else if_unmodified_since,
+                len(unique_fields),
+                int(self._hash_per_collection),
+                0]
+        for record in records:
+            data = record.copy()
+            data.pop(resource.modified_field, None)
+            args.extend([record[resource.id_field], self._encode(data)])
+            args.extend([self._encode_unique_value(record.get(field))
+                         for field in unique_fields])
+
+        reply = self._run_script(self._write_script, keys, args)
+        if reply[0] == b'unindexed':
+            msg = ("Unique values of %s records are not indexed, run the "
+                   "migrate command. Unicity is checked before writes "
+                   "meanwhile.") % resource.name
+            warnings.warn(msg)
+            self.check_unicity_many(resource, user_id, records)
+            args[4] = 1
+            reply = self._run_script(self._write_script, keys, args)
+
+        if reply[0] == b'conflict':
+            field = unique_fields[reply[1] - 1]
+            existing_id = reply[2].decode('utf-8')
+            batch = dict([(r[resource.id_field], r) for r in records])
+            existing = batch.get(existing_id)
+            if existing is None:
+                existing = self.get(resource, user_id, existing_id)
+            raise exceptions.UnicityError(field, existing)
+
+        timestamp = reply[1]
+        for i, record in enumerate(records):
+            record[resource.modified_field] = timestamp + i
+        return records
+
+    def _delete(self, resource, user_id, records_ids,
+                if_unmodified_since=None):
+        """Delete the records with the specified ids, and keep track of them
+        with consecutive timestamps. Nothing is deleted if one is not found.
+        """
+        unique_fields = resource.mapping.get_option('unique_fields')
+        keys = [self._timestamp_key(resource, user_id),
+                self._ids_key(resource, user_id),
+                self._ids_key(resource, user_id, 'deleted')]
+        keys += [self._unique_key(resource, user_id, field)
+                 for field in unique_fields]
+        keys += self._records_keys(resource, user_id, records_ids)
+        args = [utils.msec_time(),
+                '' if if_unmodified_since is None else if_unmodified_since,
+                len(unique_fields),
+                int(self._hash_per_collection)]
+        args += records_ids
+
+        timestamp = self._run_script(self._delete_script, keys, args)[1]
+        return [self._build_tombstone(resource, record_id, timestamp + i)
+                for i, record_id in enumerate(records_ids)]
+
+    def _build_record(self, resource, encoded_item, timestamp):
+        record = self._decode(encoded_item)
+        record[resource.modified_field] = int(timestamp)
+        return record
 
-    @wrap_redis_error
-    def create(self, resource, user_id, record):
-        self.check_unicity(resource, user_id, record)
+    def _build_tombstone(self, resource, record_id, timestamp):
+        tombstone = {}
+        tombstone[resource.id_field] = record_id
+        tombstone[resource.modified_field] = int(timestamp)
+        tombstone[resource.deleted_field] = True
+        return tombstone
+
+    def _get_records(self, resource, user_id, records_ids):
+        """Fetch the records with the specified ids along with their
+        timestamps, in a single round trip, skipping those which do not
+        exist.
+        """
+        if len(records_ids) == 0:
+            return []
+
+        ids_key = self._ids_key(resource, user_id)
+        keys = self._records_keys(resource, user_id, records_ids)
+        with self._client.pipeline() as multi:
+            if self._hash_per_collection:
+                multi.hmget(keys[0], records_ids)
+            else:
+                multi.mget(keys)
+            for record_id in records_ids:
+                multi.zscore(ids_key, record_id)
+            responses = multi.execute()
 
-        record = record.copy()
-        _id = record[resource.id_field] = resource.id_generator()
-        self.set_record_timestamp(resource, user_id, record)
+        encoded_items, timestamps = responses[0], responses[1:]
+        return [self._build_record(resource, encoded_item, timestamp)
+                for encoded_item, timestamp in zip(encoded_items, timestamps)
+                if encoded_item is not None and timestamp is not None]
 
-        record_key = '{0}.{1}.{2}.records'.format(resource.name,
-                                                  user_id,
-                                                  _id)
+    def _get_collection(self, resource, user_id):
+        """Fetch every record of the collection stored in a hash, along with
+        their timestamps, in a single round trip.
+        """
         with self._client.pipeline() as multi:
-            multi.set(
-                record_key,
-                self._encode(record)
-            )
-            multi.sadd(
-                '{0}.{1}.records'.format(resource.name, user_id),
-                _id
-            )
-            multi.execute()
+            multi.hgetall(self._hash_key(resource, user_id))
+            multi.zrange(self._ids_key(resource, user_id), 0, -1,
+                         withscores=True)
+            encoded_items, scores = multi.execute()
 
-        return record
+        return [self._build_record(resource, encoded_items[_id], timestamp)
+                for _id, timestamp in scores if _id in encoded_items]
+
+    def _get_tombstones(self, resource, user_id, records_ids):
+        if len(records_ids) == 0:
+            return []
+
+        ids_key = self._ids_key(resource, user_id, 'deleted')
+        with self._client.pipeline() as multi:
+            for record_id in records_ids:
+                multi.zscore(ids_key, record_id)
+            timestamps = multi.execute()
+
+        return [self._build_tombstone(resource, record_id, timestamp)
+                for record_id, timestamp in zip(records_ids, timestamps)
+                if timestamp is not None]
+
+    @wrap_redis_error
+    def create(self, resource, user_id, record):
+        record = record.copy()
+        record[resource.id_field] = resource.id_generator()
+        return self._write(resource, user_id, [record])[0]
 
     @wrap_redis_error
     def get(self, resource, user_id, record_id):
-        record_key = '{0}.{1}.{2}.records'.format(resource.name,
-                                                  user_id,
-                                                  record_id)
-        encoded_item = self._client.get(record_key)
-        if encoded_item is None:
+        records = self._get_records(resource, user_id, [record_id])
+        if len(records) == 0:
             raise exceptions.RecordNotFoundError(record_id)
 
-        return self._decode(encoded_item)
+        return records[0]
+
+    @wrap_redis_error
+    def get_many(self, resource, user_id, records_ids):
+        return self._get_records(resource, user_id, records_ids)
 
     @wrap_redis_error
-    def update(self, resource, user_id, record_id, record):
+    def update(self, resource, user_id, record_id, record,
+               if_unmodified_since=None):
         record = record.copy()
         record[resource.id_field] = record_id
-        self.check_unicity(resource, user_id, record)
+        return self._write(resource, user_id, [record],
+                           if_unmodified_since=if_unmodified_since)[0]
 
-        self.set_record_timestamp(resource, user_id, record)
-
-        record_key = '{0}.{1}.{2}.records'.format(resource.name,
-                                                  user_id,
-                                                  record_id)
-        with self._client.pipeline() as multi:
-            multi.set(
-                record_key,
-                self._encode(record)
-            )
-            multi.sadd(
-                '{0}.{1}.records'.format(resource.name, user_id),
-                record_id
-            )
-            multi.execute()
+    @wrap_redis_error
+    def delete(self, resource, user_id, record_id, if_unmodified_since=None):
+        return self._delete(resource, user_id, [record_id],
+                            if_unmodified_since=if_unmodified_since)[0]
 
-        return record
+    @wrap_redis_error
+    def create_many(self, resource, user_id, records):
+        if not records:
+            return []
+
+        records = [r.copy() for r in records]
+        specified = [r[resource.id_field] for r in records
+                     if r.get(resource.id_field) is not None]
+        existing = self.get_many(resource, user_id, specified)
+        if existing:
+            raise exceptions.UnicityError(resource.id_field, existing[0])
+
+        for record in records:
+            if record.get(resource.id_field) is None:
+                record[resource.id_field] = resource.id_generator()
+        return self.update_many(resource, user_id, records)
 
     @wrap_redis_error
-    def delete(self, resource, user_id, record_id):
-        record_key = '{0}.{1}.{2}.records'.format(resource.name,
-                                                  user_id,
-                                                  record_id)
-        with self._client.pipeline() as multi:
-            multi.get(record_key)
-            multi.delete(record_key)
-            multi.srem(
-                '{0}.{1}.records'.format(resource.name, user_id),
-                record_id
-            )
-            responses = multi.execute()
+    def update_many(self, resource, user_id, records):
+        if not records:
+            return []
 
-        encoded_item = responses[0]
-        if encoded_item is None:
-            raise exceptions.RecordNotFoundError(record_id)
+        records = [r.copy() for r in records]
+        return self._write(resource, user_id, records)
 
-        existing = self._decode(encoded_item)
-        self.set_record_timestamp(resource, user_id, existing)
-        existing = self.strip_deleted_record(resource, user_id, existing)
+    @wrap_redis_error
+    def delete_many(self, resource, user_id, records_ids):
+        if not records_ids:
+            return []
 
-        deleted_record_key = '{0}.{1}.{2}.deleted'.format(resource.name,
-                                                          user_id,
-                                                          record_id)
-        with self._client.pipeline() as multi:
-            multi.set(
-                deleted_record_key,
-                self._encode(existing)
-            )
-            multi.sadd(
-                '{0}.{1}.deleted'.format(resource.name, user_id),
-                record_id
-            )
-            multi.execute()
-
-        return existing
+        return self._delete(resource, user_id, records_ids)
 
     @wrap_redis_error
-    def get_all(self, resource, user_id, filters=None, sorting=None,
-                pagination_rules=None, limit=None, include_deleted=False):
-        records_ids_key = '{0}.{1}.records'.format(resource.name, user_id)
-        ids = self._client.smembers(records_ids_key)
+    def purge_deleted(self, before, max_batch_size=1000):
+        count = 0
+        # Tombstones are kept in ``{resource}.{user}.deleted`` sorted sets,
+        # scored by timestamps.
+        keys = self._client.scan_iter(match='*.deleted', count=max_batch_size)
+        while True:
+            batch = list(itertools.islice(keys, max_batch_size))
+            if not batch:
+                return count
+
+            with self._client.pipeline() as multi:
+                for key in batch:
+                    multi.zremrangebyscore(key, '-inf',
+                                           '({0}'.format(before))
+                count += sum(multi.execute())
 
-        keys = ('{0}.{1}.{2}.records'.format(resource.name, user_id,
-                                             _id.decode('utf-8'))
-                for _id in ids)
-
-        if len(ids) == 0:
-            records = []
+    @wrap_redis_error
+    def get_all(self, resource, user_id, filters=None, sorting=None,
+                pagination_rules=None, limit=None, include_deleted=False,
+                include_count=True):
+        filters = filters or []
+        sorting = sorting or []
+        pagination_rules = pagination_rules or []
+
+        # Targeted records are fetched directly, without listing the ids of
+        # the collection.
+        records_ids = self.extract_records_ids(resource, filters)
+
+        if records_ids is None:
+            bounds = self._timestamps_bounds(resource, filters)
+
+            if self._is_served_by_index(resource, filters, sorting,
+                                        pagination_rules):
+                return self._get_all_from_index(resource, user_id, bounds,
+                                                sorting, pagination_rules,
+                                                limit, include_deleted,
+                                                include_count)
+
+            # Only the records within timestamps bounds are fetched, and
+            # then filtered and sorted in memory.
+            unbounded = bounds == (float('-inf'), float('inf'))
+            if self._hash_per_collection and unbounded:
+                records = self._get_collection(resource, user_id)
+            else:
+                ids_key = self._ids_key(resource, user_id)
+                ids = [_id.decode('utf-8') for _id in
+                       self._client.zrangebyscore(ids_key, *bounds)]
+                records = self._get_records(resource, user_id, ids)
+
+            deleted = []
+            if include_deleted:
+                ids_key = self._ids_key(resource, user_id, 'deleted')
+                scores = self._client.zrangebyscore(ids_key, *bounds,
+                                                    withscores=True)
+                deleted = [self._build_tombstone(resource,
+                                                 _id.decode('utf-8'), score)
+                           for _id, score in scores]
         else:
-            encoded_results = self._client.mget(keys)
-            records = [self._decode(r) for r in encoded_results if r]
+            records = self._get_records(resource, user_id, records_ids)
 
-        deleted = []
-        if include_deleted:
-            deleted_ids_key = '{0}.{1}.deleted'.format(resource.name, user_id)
-            ids = self._client.smembers(deleted_ids_key)
-
-            keys = ['{0}.{1}.{2}.deleted'.format(resource.name, user_id,
-                                                 _id.decode('utf-8'))
-                    for _id in ids]
-
-            if len(keys) == 0:
-                deleted = []
-            else:
-                encoded_results = self._client.mget(keys)
-                deleted = [self._decode(r) for r in encoded_results if r]
+            deleted = []
+            if include_deleted:
+                deleted = self._get_tombstones(resource, user_id,
+                                               records_ids)
 
         records, count = self.extract_record_set(resource,
                                                  records + deleted,
@@ -222,14 +819,113 @@ class Redis(MemoryBasedStorage):
 
         return records, count
 
+    def _timestamps_bounds(self, resource, filters):
+        """Return the range of timestamps allowed by the filters on
+        the ``modified_field``, as ``(min, max)`` scores of the sorted sets
+        of ids.
+        """
+        lower, upper = float('-inf'), float('inf')
+        for filtr in filters:
+            if not self._is_indexed_filter(resource, filtr):
+                continue
+            value = filtr.value
+            if filtr.operator in (COMPARISON.GT, COMPARISON.MIN,
+                                  COMPARISON.EQ):
+                if filtr.operator == COMPARISON.GT:
+                    value += 1
+                lower = max(lower, value)
+            if filtr.operator in (COMPARISON.LT, COMPARISON.MAX,
+                                  COMPARISON.EQ):
+                if filtr.operator == COMPARISON.LT:
+                    value -= 1
+                upper = min(upper, value)
+        return lower, upper
+
+    def _is_indexed_filter(self, resource, filtr):
+        indexed = (COMPARISON.LT, COMPARISON.MAX, COMPARISON.EQ,
+                   COMPARISON.MIN, COMPARISON.GT)
+        return (filtr.field == resource.modified_field and
+                filtr.operator in indexed and
+                isinstance(filtr.value, six.integer_types) and
+                not isinstance(filtr.value, bool))
+
+    def _is_served_by_index(self, resource, filters, sorting,
+                            pagination_rules):
+        """Return ``True`` if the records can be filtered, sorted and
+        paginated using the sorted sets of ids only.
+        """
+        if len(sorting) > 1 or len(pagination_rules) > 1:
+            return False
+        if sorting and sorting[0].field != resource.modified_field:
+            return False
+        conditions = filters + list(itertools.chain(*pagination_rules))
+        return all([self._is_indexed_filter(resource, f) for f in conditions])
+
+    def _get_all_from_index(self, resource, user_id, bounds, sorting,
+                            pagination_rules, limit, include_deleted,
+                            include_count):
+        """Fetch only the records of the requested page, looked up by
+        timestamp in the sorted sets of ids.
+        """
+        descending = len(sorting) > 0 and sorting[0].direction < 0
+        lower, upper = bounds
+        for rule in pagination_rules:
+            rule_lower, rule_upper = self._timestamps_bounds(resource, rule)
+            lower, upper = max(lower, rule_lower), min(upper, rule_upper)
+
+        suffixes = ['records']
+        if include_deleted:
+            suffixes.append('deleted')
+
+        with self._client.pipeline(transaction=False) as multi:
+            for suffix in suffixes:
+                ids_key = self._ids_key(resource, user_id, suffix)
+                if descending:
+                    multi.zrevrangebyscore(ids_key, upper, lower,
+                                           start=0 if limit else None,
+                                           num=limit, withscores=True)
+                else:
+                    multi.zrangebyscore(ids_key, lower, upper,
+                                        start=0 if limit else None,
+                                        num=limit, withscores=True)
+            if include_count:
+                multi.zcount(self._ids_key(resource, user_id), *bounds)
+            responses = multi.execute()
+
+        # Records and tombstones timestamps are unique within a collection.
+        found = []
+        for suffix, scores in zip(suffixes, responses):
+            found += [(score, _id.decode('utf-8'), suffix)
+                      for _id, score in scores]
+        found = sorted(found, reverse=descending)[:limit]
+
+        records_ids = [_id for _, _id, suffix in found if suffix == 'records']
+        fetched = self._get_records(resource, user_id, records_ids)
+        fetched = dict([(r[resource.id_field], r) for r in fetched])
+
+        records = []
+        for score, _id, suffix in found:
+            if suffix == 'deleted':
+                records.append(self._build_tombstone(resource, _id, score))
+            elif _id in fetched:
+                records.append(fetched[_id])
+
+        count = responses[-1] if include_count else None
+        return records, count
+
 
 def load_from_config(config):
     settings = config.get_settings()
     uri = settings['cliquet.storage_url']
     uri = urlparse.urlparse(uri)
     pool_size = int(settings['cliquet.storage_pool_size'])
+    hash_per_collection = asbool(
+        settings['cliquet.storage_hash_per_collection'])
+    codec_klass = config.maybe_dotted(settings['cliquet.storage_codec'])
 
     return Redis(max_connections=pool_size,
+                 hash_per_collection=hash_per_collection,
+                 codec=codec_klass(settings),
                  host=uri.hostname or 'localhost',
                  port=uri.port or 6739,
                  password=uri.password or None,
@@ -133,3 +133,19 @@ class FilteringTest(BaseTest):
         result = self.resource.collection_get()
         values = [item['status'] for item in result['items']]
         self.assertTrue(all([value < 2 for value in values]))
+
+    def test_in_values(self):
+        self.resource.request.GET = {'in_status': '0,1'}
+        result = self.resource.collection_get()
+        values = [item['status'] for item in result['items']]
+        self.assertEqual(sorted(values), [0, 0, 1, 1])
+
+    def test_in_values_on_id(self):
+        self.patch_known_field.stop()
+        first = self.db.create(self.resource, 'bob', {})
+        second = self.db.create(self.resource, 'bob', {})
+        querystring = '%s,%s' % (first['id'], second['id'])
+        self.resource.request.GET = {'in_id': querystring}
+        result = self.resource.collection_get()
+        self.assertEqual(sorted([item['id'] for item in result['items']]),
+                         sorted([first['id'], second['id']]))
@@ -5,6 +5,7 @@ import mock
 from six.moves.urllib.parse import parse_qs, urlparse
 from pyramid.httpexceptions import HTTPBadRequest
 
+from cliquet.resource import BaseResource
 from cliquet.tests.resource import BaseTest
 from cliquet.utils import json
 
@@ -176,6 +177,81 @@ class PaginationTest(BaseTest):
         self.assertRaises(HTTPBadRequest, self.resource.collection_get)
 
 
+class RecordsCountTest(BaseTest):
+    def setUp(self):
+        super(RecordsCountTest, self).setUp()
+        self.patch_known_field.start()
+        for i in range(20):
+            self.db.create(self.resource, 'bob', {'status': i % 4})
+        self.get_all = mock.patch.object(self.db, 'get_all',
+                                         wraps=self.db.get_all).start()
+        self.cache = self.resource.request.registry.cache
+        self._new_resource()
+
+    def _new_resource(self):
+        # Like on every request, the collection timestamp is read again.
+        self.resource = BaseResource(self.get_request())
+        self.resource.request.registry.cache = self.cache
+        mock.patch.object(self.resource, 'is_known_field').start()
+
+    def _setup_next_page(self):
+        next_page = self.last_response.headers['Next-Page']
+        queryparams = parse_qs(urlparse(next_page).query)
+        self._new_resource()
+        self.resource.request.GET = dict([(k, v[0])
+                                          for k, v in queryparams.items()])
+
+    def test_total_records_is_given_in_headers(self):
+        self.resource.request.GET = {'_limit': '5'}
+        self.resource.collection_get()
+        self.assertEqual(self.last_response.headers['Total-Records'], '20')
+
+    def test_total_records_is_not_given_if_count_is_disabled(self):
+        self.resource.request.GET = {'_limit': '5', '_count': 'false'}
+        self.resource.collection_get()
+        self.assertNotIn('Total-Records', self.last_response.headers)
+        self.assertFalse(self.get_all.call_args[1]['include_count'])
+
+    def test_next_page_is_given_if_count_is_disabled(self):
+        self.resource.request.GET = {'_limit': '10', '_count': 'false'}
+        self.resource.collection_get()
+        self._setup_next_page()
+        self.assertEqual(self.resource.request.GET['_count'], 'false')
+        result = self.resource.collection_get()
+        self.assertEqual(len(result['items']), 10)
+
+    def test_wrong_count_raise_400(self):
+        self.resource.request.GET = {'_count': 'toto'}
+        self.assertRaises(HTTPBadRequest, self.resource.collection_get)
+
+    def test_next_pages_read_total_records_from_cache(self):
+        self.resource.request.GET = {'_limit': '5', 'not_status': '0'}
+        self.resource.collection_get()
+        self.assertTrue(self.get_all.call_args[1]['include_count'])
+        self._setup_next_page()
+        self.resource.collection_get()
+        self.assertFalse(self.get_all.call_args[1]['include_count'])
+        self.assertEqual(self.last_response.headers['Total-Records'], '15')
+
+    def test_total_records_are_counted_again_if_collection_changed(self):
+        self.resource.request.GET = {'_limit': '5'}
+        self.resource.collection_get()
+        self.db.create(self.resource, 'bob', {'status': 0})
+        self._setup_next_page()
+        self.resource.collection_get()
+        self.assertTrue(self.get_all.call_args[1]['include_count'])
+        self.assertEqual(self.last_response.headers['Total-Records'], '21')
+
+    def test_total_records_are_not_cached_if_disabled_in_settings(self):
+        with mock.patch.dict(self.resource.request.registry.settings, [
+                ('cliquet.records_count_cache_ttl', 0)]):
+            self.resource.request.GET = {'_limit': '5'}
+            self.resource.collection_get()
+            self._setup_next_page()
+            self.resource.collection_get()
+        self.assertTrue(self.get_all.call_args[1]['include_count'])
+
+
 class BuildPaginationTokenTest(BaseTest):
     def setUp(self):
         super(BuildPaginationTokenTest, self).setUp()
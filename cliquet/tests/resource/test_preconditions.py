@@ -1,8 +1,10 @@
+import mock
 import six
 from pyramid import httpexceptions
 
 from cliquet.errors import ERRORS
 from cliquet.resource import BaseResource
+from cliquet.storage import exceptions as storage_exceptions
 from cliquet.tests.resource import BaseTest
 
 
@@ -100,3 +102,42 @@ class ModifiedMeanwhileTest(BaseTest):
     def test_delete_all_returns_412_if_changed_meanwhile(self):
         self.assertRaises(httpexceptions.HTTPPreconditionFailed,
                           self.resource.collection_delete)
+
+
+class ModifiedMeanwhileInStorageTest(BaseTest):
+    def setUp(self):
+        super(ModifiedMeanwhileInStorageTest, self).setUp()
+        self.stored = self.db.create(self.resource, 'bob', {})
+        self.resource.record_id = self.stored['id']
+        timestamp = self.stored[self.resource.modified_field]
+        current = six.text_type(timestamp).encode('utf-8')
+        self.resource.request.headers['If-Unmodified-Since'] = current
+        self.resource.request.validated = {'field': 'new'}
+        self.resource.request.json = {'field': 'new'}
+        self.resource.mapping.typ.unknown = 'preserve'
+
+    def test_header_timestamp_is_given_to_storage_on_write(self):
+        with mock.patch.object(self.db, 'update',
+                               wraps=self.db.update) as mocked:
+            self.resource.put()
+            _, kwargs = mocked.call_args
+        timestamp = self.stored[self.resource.modified_field]
+        self.assertEqual(kwargs['if_unmodified_since'], timestamp)
+
+    def test_put_returns_412_if_storage_detects_change(self):
+        error = storage_exceptions.ModifiedMeanwhileError(self.stored['id'])
+        with mock.patch.object(self.db, 'update', side_effect=error):
+            self.assertRaises(httpexceptions.HTTPPreconditionFailed,
+                              self.resource.put)
+
+    def test_patch_returns_412_if_storage_detects_change(self):
+        error = storage_exceptions.ModifiedMeanwhileError(self.stored['id'])
+        with mock.patch.object(self.db, 'update', side_effect=error):
+            self.assertRaises(httpexceptions.HTTPPreconditionFailed,
+                              self.resource.patch)
+
+    def test_delete_returns_412_if_storage_detects_change(self):
+        error = storage_exceptions.ModifiedMeanwhileError(self.stored['id'])
+        with mock.patch.object(self.db, 'delete', side_effect=error):
+            self.assertRaises(httpexceptions.HTTPPreconditionFailed,
+                              self.resource.delete)
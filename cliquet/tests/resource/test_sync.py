@@ -50,6 +50,22 @@ class SinceModifiedTest(ThreadMixin, BaseTest):
         self.assertRaises(httpexceptions.HTTPBadRequest,
                           self.resource.collection_get)
 
+    def test_filter_with_since_rejects_value_older_than_retention(self):
+        settings = {'cliquet.storage_tombstone_retention_days': 30}
+        with mock.patch.dict(self.resource.request.registry.settings,
+                             settings):
+            self.resource.request.GET = {'_since': '3'}
+            self.assertRaises(httpexceptions.HTTPBadRequest,
+                              self.resource.collection_get)
+
+    def test_filter_with_since_accepts_value_within_retention(self):
+        settings = {'cliquet.storage_tombstone_retention_days': 30}
+        since = int(time.time() * 1000) - 24 * 3600 * 1000
+        with mock.patch.dict(self.resource.request.registry.settings,
+                             settings):
+            self.resource.request.GET = {'_since': '%s' % since}
+            self.resource.collection_get()  # not raising
+
     def test_filter_with_since_rejects_decimal_value(self):
         self.resource.request.GET = {'_since': '1.2'}
         self.assertRaises(httpexceptions.HTTPBadRequest,
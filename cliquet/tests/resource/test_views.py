@@ -308,6 +308,32 @@ class StorageErrorTest(FakeAuthentMixin, BaseWebTest):
                 self.assertEqual(type(mocked.call_args[0][0]), ValueError)
 
 
+class StreamedRecordsTest(FakeAuthentMixin, BaseWebTest):
+    def test_streamed_records_are_rendered_as_list(self):
+        records = ({'id': str(i), 'last_modified': i} for i in range(3))
+        with mock.patch('cliquet.storage.memory.Memory.get_all',
+                        return_value=(records, 3)):
+            resp = self.app.get(self.collection_url, headers=self.headers)
+        self.assertIn('application/json', resp.headers['Content-Type'])
+        self.assertEqual(resp.headers['Total-Records'], '3')
+        self.assertEqual(len(resp.json['items']), 3)
+
+    def test_streamed_records_are_released_when_response_is_closed(self):
+        released = []
+
+        def records():
+            try:
+                for i in range(3):
+                    yield {'id': str(i), 'last_modified': i}
+            finally:
+                released.append(True)
+
+        with mock.patch('cliquet.storage.memory.Memory.get_all',
+                        return_value=(records(), 3)):
+            self.app.get(self.collection_url, headers=self.headers)
+        self.assertEqual(released, [True])
+
+
 class CacheErrorTest(FakeAuthentMixin, BaseWebTest):
     def test_cache_errors_are_served_as_503(self):
         with mock.patch('cliquet.cache.redis.Redis.get',
@@ -0,0 +1,160 @@
+--
+-- This is a copy of storage/postgresql/schema.sql at schema version 10.
+-- It is used in schema migration tests to execute the migration of
+-- timestamps to epoch integers, which is applied by batches.
+--
+
+--
+-- Convert timestamps to milliseconds epoch integer
+--
+CREATE OR REPLACE FUNCTION as_epoch(ts TIMESTAMP) RETURNS BIGINT AS $$
+BEGIN
+    RETURN (EXTRACT(EPOCH FROM ts) * 1000)::BIGINT;
+END;
+$$ LANGUAGE plpgsql
+IMMUTABLE;
+
+--
+-- Actual records
+--
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+
+    -- Timestamp is relevant because adequate semantically.
+    -- Since the HTTP API manipulates integers, it could make sense
+    -- to replace the timestamp columns type by integer.
+    last_modified TIMESTAMP NOT NULL,
+
+    -- JSONB, 2x faster than JSON.
+    data JSONB NOT NULL DEFAULT '{}'::JSONB,
+
+    PRIMARY KEY (id, user_id, resource_name)
+);
+
+DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified;
+CREATE UNIQUE INDEX idx_records_user_id_resource_name_last_modified
+    ON records(user_id, resource_name, last_modified DESC);
+DROP INDEX IF EXISTS idx_records_last_modified_epoch;
+CREATE INDEX idx_records_last_modified_epoch ON records(as_epoch(last_modified));
+-- Serves pagination on the default sort, as row-value comparisons.
+DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified_epoch;
+CREATE INDEX idx_records_user_id_resource_name_last_modified_epoch
+    ON records(user_id, resource_name, as_epoch(last_modified), id);
+-- Serves equality filters, as JSONB containment.
+DROP INDEX IF EXISTS idx_records_data_path_ops;
+CREATE INDEX idx_records_data_path_ops
+    ON records USING GIN (data jsonb_path_ops);
+
+
+--
+-- Deleted records, without data.
+--
+CREATE TABLE IF NOT EXISTS deleted (
+    id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified TIMESTAMP NOT NULL,
+
+    PRIMARY KEY (id, user_id, resource_name)
+);
+DROP INDEX IF EXISTS idx_records_user_id_resource_name_last_modified;
+CREATE UNIQUE INDEX idx_records_user_id_resource_name_last_modified
+    ON records(user_id, resource_name, last_modified DESC);
+DROP INDEX IF EXISTS idx_deleted_last_modified_epoch;
+CREATE INDEX idx_deleted_last_modified_epoch ON deleted(as_epoch(last_modified));
+DROP INDEX IF EXISTS idx_deleted_user_id_resource_name_last_modified_epoch;
+CREATE INDEX idx_deleted_user_id_resource_name_last_modified_epoch
+    ON deleted(user_id, resource_name, as_epoch(last_modified), id);
+
+
+--
+-- Collections timestamps, maintained by triggers on records and deleted.
+--
+CREATE TABLE IF NOT EXISTS timestamps (
+    user_id TEXT NOT NULL,
+    resource_name TEXT NOT NULL,
+    last_modified TIMESTAMP NOT NULL,
+
+    PRIMARY KEY (user_id, resource_name)
+);
+
+
+--
+-- Helper that returns the current collection timestamp.
+--
+CREATE OR REPLACE FUNCTION resource_timestamp(uid VARCHAR, resource VARCHAR)
+RETURNS TIMESTAMP AS $$
+DECLARE
+    ts TIMESTAMP;
+BEGIN
+    SELECT last_modified INTO ts
+      FROM timestamps
+     WHERE user_id = uid
+       AND resource_name = resource;
+
+    -- Collection timestamp or current if empty
+    RETURN coalesce(ts, localtimestamp);
+END;
+$$ LANGUAGE plpgsql;
+
+--
+-- Triggers to set last_modified on INSERT/UPDATE
+--
+DROP TRIGGER IF EXISTS tgr_records_last_modified ON records;
+DROP TRIGGER IF EXISTS tgr_deleted_last_modified ON deleted;
+
+CREATE OR REPLACE FUNCTION bump_timestamp()
+RETURNS trigger AS $$
+DECLARE
+    current TIMESTAMP;
+BEGIN
+    --
+    -- This bumps the current timestamp to 1 msec in the future if the previous
+    -- timestamp is equal to the current one (or higher if was bumped already).
+    --
+    -- The collection timestamp row is locked by the upsert, so that
+    -- concurrent writes on the same collection obtain distinct timestamps.
+    -- See https://github.com/mozilla-services/cliquet/issues/25
+    --
+    -- An empty collection has the current timestamp, hence the first write
+    -- is bumped too.
+    --
+    INSERT INTO timestamps AS t (user_id, resource_name, last_modified)
+    VALUES (NEW.user_id, NEW.resource_name,
+            localtimestamp + INTERVAL '1 milliseconds')
+    ON CONFLICT (user_id, resource_name) DO UPDATE
+       SET last_modified = greatest(localtimestamp,
+                                    t.last_modified + INTERVAL '1 milliseconds')
+    RETURNING last_modified INTO current;
+
+    NEW.last_modified := current;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER tgr_records_last_modified
+BEFORE INSERT OR UPDATE ON records
+FOR EACH ROW EXECUTE PROCEDURE bump_timestamp();
+
+-- Tombstones inserted in bulk are given their timestamps by the statement.
+CREATE TRIGGER tgr_deleted_last_modified
+BEFORE INSERT OR UPDATE ON deleted
+FOR EACH ROW WHEN (NEW.last_modified IS NULL)
+EXECUTE PROCEDURE bump_timestamp();
+
+--
+-- Metadata table
+--
+CREATE TABLE IF NOT EXISTS metadata (
+    name VARCHAR(128) NOT NULL,
+    value VARCHAR(512) NOT NULL
+);
+INSERT INTO metadata (name, value) VALUES ('created_at', NOW()::TEXT);
+
+
+-- Set storage schema version.
+-- Should match ``cliquet.storage.postgresql.PostgreSQL.schema_version``
+INSERT INTO metadata (name, value) VALUES ('storage_schema_version', '10');
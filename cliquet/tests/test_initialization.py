@@ -191,6 +191,16 @@ class StatsDConfigurationTest(unittest.TestCase):
         app.get('/v0/__heartbeat__')
         mocked().count.assert_any_call('view.heartbeat.GET')
 
+    @mock.patch('cliquet.statsd.Client')
+    def test_statsd_reports_connection_pools_usage(self, mocked):
+        cliquet.initialize(self.config, '0.0.1')
+        pool = mock.Mock()
+        pool.stats.return_value = {'size': 3}
+        self.config.registry.storage = mock.Mock(pool=pool)
+        app = webtest.TestApp(self.config.make_wsgi_app())
+        app.get('/v0/__heartbeat__')
+        mocked().gauge.assert_any_call('storage.pool.size', 3)
+
     @mock.patch('cliquet.views.oauth.relier.OAuthClient.verify_token')
     @mock.patch('cliquet.statsd.Client')
     def test_statsd_counts_unique_users(self, mocked, verify_mocked):
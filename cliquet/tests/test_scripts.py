@@ -1,10 +1,21 @@
 import mock
 
+from cliquet.resource import BaseResource
 from cliquet.scripts import cliquet as cliquet_script
 
 from .support import unittest
 
 
+class Mushroom(BaseResource):
+    pass
+
+
+class Toadstool(BaseResource):
+    @property
+    def name(self):
+        return 'amanita'
+
+
 class InitSchemaTest(unittest.TestCase):
     def test_init_schema_calls_initialize_schema_on_cache_and_storage(self):
         fakeregistry = mock.MagicMock()
@@ -15,3 +26,57 @@ class InitSchemaTest(unittest.TestCase):
                 cliquet_script.main()
                 self.assertTrue(fakeregistry.storage.initialize_schema.called)
                 self.assertTrue(fakeregistry.cache.initialize_schema.called)
+
+    def test_init_schema_creates_indices_of_registered_resources(self):
+        fakeregistry = mock.MagicMock()
+        service = mock.MagicMock(definitions=[
+            ('GET', 'collection_get', {'klass': Mushroom}),
+            ('GET', 'get', {'klass': Mushroom}),
+            ('GET', 'view', {'klass': object}),
+            ('GET', 'view', {})])
+        fakeregistry.cornice_services = {'/mushrooms': service}
+        cliquet_script.init_schema({'registry': fakeregistry})
+        fakeregistry.storage.create_indices.assert_called_once_with(
+            'mushroom', Mushroom.mapping)
+
+    def test_init_schema_uses_the_name_of_resources(self):
+        fakeregistry = mock.MagicMock()
+        service = mock.MagicMock(definitions=[
+            ('GET', 'collection_get', {'klass': Toadstool})])
+        fakeregistry.cornice_services = {'/toadstools': service}
+        cliquet_script.init_schema({'registry': fakeregistry})
+        fakeregistry.storage.create_indices.assert_called_once_with(
+            'amanita', Toadstool.mapping)
+
+
+class PurgeDeletedTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = mock.MagicMock()
+        self.registry.settings = {
+            'cliquet.storage_tombstone_retention_days': '30'
+        }
+        self.registry.storage.purge_deleted.return_value = 0
+
+    def test_purge_deleted_is_available_as_command(self):
+        with mock.patch('cliquet.scripts.cliquet.bootstrap') as mocked:
+            mocked.return_value = {'registry': self.registry}
+            with mock.patch('cliquet.scripts.cliquet.sys') as sys_mocked:
+                sys_mocked.argv = ['prog', '--ini', 'foo.ini',
+                                   'purge-deleted']
+                cliquet_script.main()
+        self.assertTrue(self.registry.storage.purge_deleted.called)
+
+    @mock.patch('cliquet.scripts.cliquet.utils.msec_time')
+    def test_purge_deleted_removes_records_older_than_retention(self, now):
+        now.return_value = 40 * 24 * 3600 * 1000
+        cliquet_script.purge_deleted({'registry': self.registry})
+        self.registry.storage.purge_deleted.assert_called_with(
+            before=10 * 24 * 3600 * 1000)
+
+    def test_purge_deleted_fails_if_no_retention_is_configured(self):
+        self.registry.settings = {
+            'cliquet.storage_tombstone_retention_days': None
+        }
+        code = cliquet_script.purge_deleted({'registry': self.registry})
+        self.assertEqual(code, 1)
+        self.assertFalse(self.registry.storage.purge_deleted.called)
@@ -51,6 +51,11 @@ class StatsdClientTest(unittest.TestCase):
             self.client.count('click', unique='menu')
             mocked_client.set.assert_called_with('click', 'menu')
 
+    def test_gauge_sets_the_value_for_key(self):
+        with mock.patch.object(self.client, '_client') as mocked_client:
+            self.client.gauge('pool.size', 3)
+            mocked_client.gauge.assert_called_with('pool.size', 3)
+
     @mock.patch('cliquet.statsd.statsd_module')
     def test_load_from_config(self, module_mock):
         config = testing.setUp()
@@ -41,7 +41,10 @@ class PostgresqlStorageMigrationTest(unittest.TestCase):
         q = """
         DROP TABLE IF EXISTS records CASCADE;
         DROP TABLE IF EXISTS deleted CASCADE;
+        DROP TABLE IF EXISTS timestamps CASCADE;
+        DROP TABLE IF EXISTS collections CASCADE;
         DROP TABLE IF EXISTS metadata CASCADE;
+        DROP FUNCTION IF EXISTS resource_timestamp(VARCHAR, VARCHAR);
         """
         with self.db.connect() as cursor:
             cursor.execute(q)
@@ -50,6 +53,17 @@ class PostgresqlStorageMigrationTest(unittest.TestCase):
         version = self.db._get_installed_version()
         self.assertEqual(version, self.version)
 
+    def test_schema_version_is_compared_as_a_number(self):
+        with self.db.connect() as cursor:
+            q = """
+            INSERT INTO metadata (name, value)
+            VALUES ('storage_schema_version', '9'),
+                   ('storage_schema_version', '10');
+            """
+            cursor.execute(q)
+        version = self.db._get_installed_version()
+        self.assertEqual(version, self.version)
+
     def test_schema_is_not_recreated_from_scratch_if_already_exists(self):
         mocked = self.sql_execute_patcher.start()
         self.db.initialize_schema()
@@ -132,6 +146,173 @@ class PostgresqlStorageMigrationTest(unittest.TestCase):
         migrated, count = self.db.get_all(TestResource(), 'jean-louis')
         self.assertEqual(migrated[0], before)
 
+        # Collection timestamp was backfilled.
+        timestamp = self.db.collection_timestamp(resource, 'jean-louis')
+        self.assertEqual(timestamp, before[resource.modified_field])
+
+    def _install_schema_10(self):
+        self._delete_everything()
+        with self.db.connect() as cursor:
+            here = os.path.abspath(os.path.dirname(__file__))
+            filepath = 'schema/postgresql-storage-10.sql'
+            schema = open(os.path.join(here, filepath)).read()
+            cursor.execute(schema)
+
+    def _write_version_10(self, query, record_id):
+        query = query + " RETURNING as_epoch(last_modified) AS last_modified;"
+        with self.db.connect() as cursor:
+            cursor.execute(query, dict(id=record_id))
+            return cursor.fetchone()['last_modified']
+
+    def test_timestamps_are_migrated_to_epoch_by_batches(self):
+        self._install_schema_10()
+        resource = TestResource()
+        insert = """
+        INSERT INTO %s (id, user_id, resource_name)
+        VALUES (%%(id)s, 'jean-louis', 'test')
+        """
+        expected = {}
+        for record_id in ('a', 'b', 'c'):
+            expected[record_id] = self._write_version_10(insert % 'records',
+                                                         record_id)
+        expected['d'] = self._write_version_10(insert % 'deleted', 'd')
+
+        prepare = self.db._prepare_migration_010_011
+        with mock.patch.object(self.db, '_prepare_migration_010_011') as m:
+            m.side_effect = lambda: prepare(max_batch_size=2)
+            self.db.initialize_schema()
+        self.assertEqual(self.db._get_installed_version(), self.version)
+
+        migrated, count = self.db.get_all(resource, 'jean-louis',
+                                          include_deleted=True)
+        self.assertEqual(dict([(r['id'], r['last_modified'])
+                               for r in migrated]), expected)
+        # Collection timestamp was not bumped.
+        timestamp = self.db.collection_timestamp(resource, 'jean-louis')
+        self.assertEqual(timestamp, expected['d'])
+
+    def test_records_written_during_migration_are_migrated(self):
+        self._install_schema_10()
+        resource = TestResource()
+        insert = """
+        INSERT INTO records (id, user_id, resource_name)
+        VALUES (%(id)s, 'jean-louis', 'test')
+        """
+        self._write_version_10(insert, 'a')
+        self.db._prepare_migration_010_011()
+
+        update = """
+        UPDATE records SET data = '{"drink": "cacao"}'
+         WHERE id = %(id)s
+        """
+        updated = self._write_version_10(update, 'a')
+        inserted = self._write_version_10(insert, 'b')
+        self.db._execute_sql_file('migrations/migration_010_011.sql')
+        self.db.initialize_schema()
+
+        migrated = self.db.get(resource, 'jean-louis', 'a')
+        self.assertEqual(migrated['last_modified'], updated)
+        self.assertEqual(migrated['drink'], 'cacao')
+        migrated = self.db.get(resource, 'jean-louis', 'b')
+        self.assertEqual(migrated['last_modified'], inserted)
+
+    def test_records_are_keyed_by_collection_ids(self):
+        self._install_schema_10()
+        resource = TestResource()
+        insert = """
+        INSERT INTO records (id, user_id, resource_name)
+        VALUES (%(id)s, 'jean-louis', 'test')
+        """
+        self._write_version_10(insert, 'a')
+        self._write_version_10(insert.replace('jean-louis', 'mat'), 'a')
+        self._write_version_10(insert.replace('records', 'deleted'), 'b')
+        self.db.initialize_schema()
+
+        query = """
+        SELECT c.user_id, count(*) AS count
+          FROM collections AS c
+          JOIN records AS r ON r.collection_id = c.id
+         GROUP BY c.user_id
+         ORDER BY c.user_id;
+        """
+        with self.db.connect() as cursor:
+            cursor.execute(query)
+            rows = [tuple(row) for row in cursor.fetchall()]
+        self.assertEqual(rows, [('jean-louis', 1), ('mat', 1)])
+
+        records, count = self.db.get_all(resource, 'jean-louis',
+                                         include_deleted=True)
+        self.assertEqual(sorted([r['id'] for r in records]), ['a', 'b'])
+        # Collection timestamp was kept.
+        timestamp = self.db.collection_timestamp(resource, 'jean-louis')
+        self.assertEqual(timestamp, max([r['last_modified']
+                                         for r in records]))
+
+    def _get_partitioned_storage(self, partitions, resources):
+        settings = self.settings.copy()
+        settings['cliquet.storage_partitions'] = partitions
+        settings['cliquet.storage_partitioned_resources'] = resources
+        config = mock.Mock(get_settings=mock.Mock(return_value=settings))
+        # Other tests run on unpartitioned tables.
+        self.addCleanup(self.db.initialize_schema)
+        self.addCleanup(self._delete_everything)
+        return postgresql.load_from_config(config)
+
+    def _get_partition(self, record_id):
+        query = """
+        SELECT tableoid::regclass::text AS partition
+          FROM records
+         WHERE id = %(id)s;
+        """
+        with self.db.connect() as cursor:
+            cursor.execute(query, dict(id=record_id))
+            return cursor.fetchone()['partition']
+
+    def test_existing_tables_are_converted_to_partitioned_tables(self):
+        resource = TestResource()
+        record = self.db.create(resource, 'jean-louis', {'drink': 'cacao'})
+        deleted = self.db.create(resource, 'jean-louis', {})
+        tombstone = self.db.delete(resource, 'jean-louis', deleted['id'])
+
+        db = self._get_partitioned_storage(2, '')
+        db.initialize_schema()
+
+        self.assertRegexpMatches(self._get_partition(record['id']),
+                                 r'^records_\d$')
+        records, count = db.get_all(resource, 'jean-louis',
+                                    include_deleted=True)
+        self.assertEqual(sorted(records, key=lambda r: r['last_modified']),
+                         [record, tombstone])
+        # Triggers were recreated.
+        created = db.create(resource, 'jean-louis', {})
+        self.assertGreater(created['last_modified'],
+                           tombstone['last_modified'])
+
+    def test_rows_are_moved_to_partitions_of_resources_listed_later(self):
+        db = self._get_partitioned_storage(2, 'other')
+        db.initialize_schema()
+        resource = TestResource()
+        record = db.create(resource, 'jean-louis', {'drink': 'cacao'})
+        self.assertRegexpMatches(self._get_partition(record['id']),
+                                 r'^records_default_\d$')
+
+        db = self._get_partitioned_storage(2, 'other test')
+        db.initialize_schema()
+        self.assertRegexpMatches(self._get_partition(record['id']),
+                                 r'^records_test_[0-9a-f]{8}_\d$')
+        self.assertEqual(db.get(resource, 'jean-louis', record['id']),
+                         record)
+
+    def test_resources_are_not_partitioned_if_tables_are_hashed(self):
+        db = self._get_partitioned_storage(2, '')
+        db.initialize_schema()
+
+        db = self._get_partitioned_storage(2, 'test')
+        with mock.patch('cliquet.storage.postgresql.warnings.warn') as warn:
+            db.initialize_schema()
+        warn.assert_any_call('Table records is not partitioned by resource '
+                             'names. Ignore partitioned resources.')
+
     def test_every_available_migration_succeeds_if_tables_were_flushed(self):
         # During tests, tables can be flushed.
         self.db.flush()
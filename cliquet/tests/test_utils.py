@@ -4,7 +4,7 @@ import colander
 import six
 
 from cliquet.utils import (native_value, strip_whitespace, random_bytes_hex,
-                           read_env)
+                           read_env, json, JSONStream)
 
 from .support import unittest
 
@@ -83,3 +83,38 @@ class ReadEnvironmentTest(unittest.TestCase):
     def test_return_env_value_is_coerced_to_python(self):
         os.environ.setdefault('CLIQUET_CONF_NAME', '3.14')
         self.assertEqual(read_env('cliquet-conf.name', 12), 3.14)
+
+
+class JSONStreamTest(unittest.TestCase):
+    def test_generators_are_serialized_chunk_by_chunk(self):
+        value = {'items': (r for r in [{'a': 1}, {'b': 2}]), 'c': None}
+        chunks = list(JSONStream(value))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(json.loads(b''.join(chunks).decode('utf-8')),
+                         {'items': [{'a': 1}, {'b': 2}], 'c': None})
+
+    def test_empty_generators_are_serialized_as_empty_lists(self):
+        chunks = JSONStream((r for r in []))
+        self.assertEqual(b''.join(chunks), b'[]')
+
+    def test_closing_the_stream_closes_its_generators(self):
+        released = []
+
+        def records():
+            try:
+                yield {'a': 1}
+                yield {'b': 2}
+            finally:
+                released.append(True)
+
+        stream = JSONStream({'items': records()})
+        while b'"a"' not in next(stream):
+            pass
+        stream.close()
+        self.assertEqual(released, [True])
+
+    def test_unconsumed_generators_are_closed_too(self):
+        records = (r for r in [{'a': 1}])
+        next(records)
+        JSONStream({'items': records}).close()
+        self.assertRaises(StopIteration, next, records)
@@ -5,11 +5,17 @@ import mock
 from pyramid.response import Response
 
 from cliquet import DEFAULT_SETTINGS
-from cliquet.views.batch import BatchPayloadSchema, batch as batch_service
+from cliquet.storage import exceptions as storage_exceptions
+from cliquet.views.batch import (BatchPayloadSchema, batch as batch_service,
+                                 split_runs, BulkStorage, invoke_subrequest)
 from cliquet.tests.support import BaseWebTest, unittest, DummyRequest
+from cliquet.tests.testapp.views import Mushroom
 from cliquet.utils import json
 
 
+RECORD_ID = '472be9ec-26fe-461b-8282-9c4e4b207ab3'
+
+
 class BatchViewTest(BaseWebTest, unittest.TestCase):
 
     def test_does_not_require_authentication(self):
@@ -94,6 +100,260 @@ class BatchViewTest(BaseWebTest, unittest.TestCase):
         self.assertIn('application/json', hello['headers']['Content-Type'])
 
 
+class BatchBulkWritesTest(BaseWebTest, unittest.TestCase):
+
+    def post_batch(self, requests):
+        body = {'requests': requests}
+        resp = self.app.post_json('/batch', body, headers=self.headers)
+        return resp.json['responses']
+
+    def create_mushrooms(self, *names):
+        requests = [{'method': 'POST', 'path': '/mushrooms',
+                     'body': {'name': name}} for name in names]
+        return self.post_batch(requests)
+
+    def test_runs_of_creations_are_written_at_once(self):
+        with mock.patch.object(self.db, 'create_many',
+                               wraps=self.db.create_many) as mocked:
+            responses = self.create_mushrooms('morel', 'chanterelle')
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual([r['status'] for r in responses], [201, 201])
+        resp = self.app.get('/mushrooms', headers=self.headers)
+        self.assertEqual(len(resp.json['items']), 2)
+
+    def test_created_records_responses_have_their_timestamps(self):
+        responses = self.create_mushrooms('morel', 'chanterelle')
+        for response in responses:
+            record = response['body']
+            resp = self.app.get('/mushrooms/%s' % record['id'],
+                                headers=self.headers)
+            self.assertEqual(resp.json, record)
+            content_length = int(response['headers']['Content-Length'])
+            self.assertEqual(content_length, len(json.dumps(record)))
+
+    def test_runs_of_deletions_are_written_at_once(self):
+        responses = self.create_mushrooms('morel', 'chanterelle')
+        requests = [{'method': 'DELETE',
+                     'path': '/mushrooms/%s' % r['body']['id']}
+                    for r in responses]
+        with mock.patch.object(self.db, 'delete_many',
+                               wraps=self.db.delete_many) as mocked:
+            responses = self.post_batch(requests)
+        self.assertEqual(mocked.call_count, 1)
+        self.assertEqual([r['status'] for r in responses], [200, 200])
+        self.assertTrue(all([r['body']['deleted'] for r in responses]))
+        self.assertTrue(all([r['body']['last_modified'] for r in responses]))
+
+    def test_records_of_a_run_are_fetched_at_once(self):
+        responses = self.create_mushrooms('morel', 'chanterelle')
+        requests = [{'method': 'PATCH',
+                     'path': '/mushrooms/%s' % r['body']['id'],
+                     'body': {'name': 'amanita'}}
+                    for r in responses]
+        with mock.patch.object(self.db, 'get_many',
+                               wraps=self.db.get_many) as mocked:
+            with mock.patch.object(self.db, 'get') as mocked_get:
+                responses = self.post_batch(requests)
+        self.assertEqual(mocked.call_count, 1)
+        self.assertFalse(mocked_get.called)
+        self.assertEqual([r['status'] for r in responses], [200, 200])
+        self.assertEqual([r['body']['name'] for r in responses],
+                         ['amanita', 'amanita'])
+
+    def test_failed_subrequests_are_not_written(self):
+        responses = self.create_mushrooms('morel')
+        record_id = responses[0]['body']['id']
+        requests = [{'method': 'DELETE', 'path': '/mushrooms/%s' % record_id},
+                    {'method': 'DELETE', 'path': '/mushrooms/%s' % RECORD_ID}]
+        responses = self.post_batch(requests)
+        self.assertEqual([r['status'] for r in responses], [200, 404])
+
+    def test_records_are_written_one_by_one_if_bulk_write_fails(self):
+        create_many = self.db.create_many
+
+        def fail_in_bulk(resource, user_id, records):
+            if len(records) > 1:
+                raise storage_exceptions.BackendError('Boom')
+            return create_many(resource, user_id, records)
+
+        with mock.patch.object(self.db, 'create_many',
+                               side_effect=fail_in_bulk):
+            with mock.patch('cliquet.views.batch.invoke_subrequest',
+                            wraps=invoke_subrequest) as mocked:
+                responses = self.create_mushrooms('morel', 'chanterelle')
+        self.assertEqual(mocked.call_count, 2)
+        self.assertEqual([r['status'] for r in responses], [201, 201])
+        resp = self.app.get('/mushrooms', headers=self.headers)
+        self.assertEqual(len(resp.json['items']), 2)
+        for response in responses:
+            record = response['body']
+            resp = self.app.get('/mushrooms/%s' % record['id'],
+                                headers=self.headers)
+            self.assertEqual(resp.json, record)
+
+    def test_failed_writes_get_error_responses_if_bulk_write_fails(self):
+        update_many = self.db.update_many
+        responses = self.create_mushrooms('morel', 'amanita')
+        record_id = responses[0]['body']['id']
+        existing = responses[1]['body']
+        unicity_error = storage_exceptions.UnicityError('name', existing)
+
+        def fail_in_bulk(resource, user_id, records):
+            if len(records) > 1:
+                raise unicity_error
+            return update_many(resource, user_id, records)
+
+        requests = [{'method': 'PUT', 'path': '/mushrooms/%s' % record_id,
+                     'body': {'name': 'amanita'}},
+                    {'method': 'PUT', 'path': '/mushrooms/%s' % RECORD_ID,
+                     'body': {'name': 'amanita'}}]
+        with mock.patch.object(self.db, 'update_many',
+                               side_effect=fail_in_bulk):
+            with mock.patch.object(self.db, 'update') as mocked:
+                mocked.side_effect = [
+                    {'id': record_id, 'name': 'amanita', 'last_modified': 42},
+                    unicity_error]
+                responses = self.post_batch(requests)
+        self.assertEqual([r['status'] for r in responses], [200, 409])
+        self.assertEqual(responses[0]['body']['last_modified'], 42)
+        error = responses[1]['body']
+        self.assertEqual(error['errno'], 122)
+        self.assertEqual(error['message'],
+                         'Conflict of field name on record %s' %
+                         existing['id'])
+
+    def test_missing_records_get_404_responses_if_bulk_write_fails(self):
+        responses = self.create_mushrooms('morel', 'amanita')
+        requests = [{'method': 'DELETE',
+                     'path': '/mushrooms/%s' % r['body']['id']}
+                    for r in responses]
+        error = storage_exceptions.RecordNotFoundError(RECORD_ID)
+        with mock.patch.object(self.db, 'delete_many', side_effect=error):
+            with mock.patch.object(self.db, 'delete') as mocked:
+                mocked.side_effect = [{'id': responses[0]['body']['id'],
+                                       'deleted': True,
+                                       'last_modified': 42}, error]
+                responses = self.post_batch(requests)
+        self.assertEqual([r['status'] for r in responses], [200, 404])
+        self.assertEqual(responses[1]['body']['errno'], 110)
+
+    def test_backend_errors_get_503_responses_if_bulk_write_fails(self):
+        error = storage_exceptions.BackendError('Boom')
+        with mock.patch.object(self.db, 'create_many', side_effect=error):
+            responses = self.create_mushrooms('morel', 'amanita')
+        self.assertEqual([r['status'] for r in responses], [503, 503])
+        self.assertIn('Retry-After', responses[0]['headers'])
+
+
+class SplitRunsTest(unittest.TestCase):
+    def setUp(self):
+        self.request = DummyRequest()
+
+    def split(self, *requests):
+        runs = split_runs(self.request, requests)
+        return [len(run) for run in runs]
+
+    def test_consecutive_writes_on_the_same_collection_are_grouped(self):
+        runs = self.split({'method': 'POST', 'path': '/mushrooms'},
+                          {'method': 'POST', 'path': '/mushrooms'},
+                          {'method': 'PUT', 'path': '/mushrooms/a'},
+                          {'method': 'PUT', 'path': '/mushrooms/b'})
+        self.assertEqual(runs, [2, 2])
+
+    def test_reads_are_not_grouped(self):
+        runs = self.split({'path': '/mushrooms'},
+                          {'path': '/mushrooms'})
+        self.assertEqual(runs, [1, 1])
+
+    def test_writes_on_other_collections_start_a_new_run(self):
+        runs = self.split({'method': 'DELETE', 'path': '/mushrooms/a'},
+                          {'method': 'DELETE', 'path': '/articles/b'})
+        self.assertEqual(runs, [1, 1])
+
+    def test_writes_of_another_user_start_a_new_run(self):
+        headers = {'Authorization': 'Basic YWxpY2U6'}
+        runs = self.split({'method': 'POST', 'path': '/mushrooms'},
+                          {'method': 'POST', 'path': '/mushrooms',
+                           'headers': headers})
+        self.assertEqual(runs, [1, 1])
+
+    def test_writes_of_the_same_record_start_a_new_run(self):
+        runs = self.split({'method': 'PATCH', 'path': '/mushrooms/a'},
+                          {'method': 'PATCH', 'path': '/mushrooms/a'})
+        self.assertEqual(runs, [1, 1])
+
+    def test_writes_with_preconditions_are_not_grouped(self):
+        headers = {'If-Unmodified-Since': '1234'}
+        runs = self.split({'method': 'POST', 'path': '/mushrooms',
+                           'headers': headers},
+                          {'method': 'POST', 'path': '/mushrooms',
+                           'headers': headers})
+        self.assertEqual(runs, [1, 1])
+
+    def test_conditional_writes_are_not_grouped(self):
+        for headers in [{'If-Match': '"1234"'}, {'If-None-Match': '*'},
+                        {'if-modified-since': '1234'}]:
+            runs = self.split({'method': 'PUT', 'path': '/mushrooms/a',
+                               'headers': headers},
+                              {'method': 'PUT', 'path': '/mushrooms/b',
+                               'headers': headers})
+            self.assertEqual(runs, [1, 1])
+
+
+class Toadstool(Mushroom):
+    def create_record(self, record):
+        record = super(Toadstool, self).create_record(record)
+        record['poisonous'] = True
+        return record
+
+
+class BulkStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = mock.MagicMock()
+        self.bulk = BulkStorage(self.storage)
+        self.bulk.current = 0
+        self.resource = Mushroom.__new__(Mushroom)
+        self.resource.id_generator = lambda: RECORD_ID
+
+    def test_creations_are_queued_and_written_with_create_many(self):
+        created = self.bulk.create(self.resource, 'bob', {'name': 'morel'})
+        self.assertEqual(created['id'], RECORD_ID)
+        self.assertFalse(self.storage.create.called)
+        self.storage.create_many.return_value = [created]
+        self.bulk.flush()
+        self.storage.create_many.assert_called_with(
+            self.resource, 'bob', [{'id': RECORD_ID, 'name': 'morel'}])
+        self.assertFalse(self.storage.update_many.called)
+
+    def test_writes_of_resources_overriding_hooks_are_not_queued(self):
+        resource = Toadstool.__new__(Toadstool)
+        self.bulk.create(resource, 'bob', {})
+        self.storage.create.assert_called_with(resource, 'bob', {})
+        self.assertEqual(self.bulk.flush(), ({}, {}))
+
+    def test_conditional_writes_are_not_queued(self):
+        self.bulk.update(self.resource, 'bob', RECORD_ID, {},
+                         if_unmodified_since=42)
+        self.storage.update.assert_called_with(self.resource, 'bob',
+                                               RECORD_ID, {}, 42)
+        self.bulk.delete(self.resource, 'bob', RECORD_ID,
+                         if_unmodified_since=42)
+        self.storage.delete.assert_called_with(self.resource, 'bob',
+                                               RECORD_ID, 42)
+        self.assertEqual(self.bulk.flush(), ({}, {}))
+
+    def test_records_are_written_one_by_one_if_bulk_write_fails(self):
+        self.bulk.delete(self.resource, 'bob', 'a')
+        self.bulk.current = 1
+        self.bulk.delete(self.resource, 'bob', 'b')
+        error = storage_exceptions.RecordNotFoundError('b')
+        self.storage.delete_many.side_effect = error
+        self.storage.delete.side_effect = [{'id': 'a'}, error]
+        written, failed = self.bulk.flush()
+        self.assertEqual(written, {0: [(self.resource, {'id': 'a'})]})
+        self.assertEqual(failed, {1: (self.resource, error)})
+
+
 class BatchSchemaTest(unittest.TestCase):
     def setUp(self):
         self.schema = BatchPayloadSchema()
@@ -264,6 +524,11 @@ class BatchServiceTest(unittest.TestCase):
         subrequest, = self.request.invoke_subrequest.call_args[0]
         self.assertIn('Basic', subrequest.headers['Authorization'])
 
+    def test_subrequests_have_the_batch_request_as_parent(self):
+        self.post({'requests': [{'path': '/'}]})
+        subrequest, = self.request.invoke_subrequest.call_args[0]
+        self.assertEqual(subrequest.parent, self.request)
+
     def test_subrequests_body_are_json_serialized(self):
         request = {'path': '/', 'body': {'json': 'payload'}}
         self.post({'requests': [request]})
@@ -2,6 +2,7 @@ import ast
 import os
 import six
 import time
+import types
 from base64 import b64decode, b64encode
 from binascii import hexlify
 
@@ -17,6 +18,54 @@ def strip_whitespace(v):
     return v.strip(' \t\n\r') if v is not null else v
 
 
+class JSONStream(object):
+    """Iterator of the UTF-8 encoded JSON chunks of a value, that can be
+    used as a response ``app_iter``. Its generators (e.g. records streamed
+    from storage) are serialized as they are consumed.
+
+    Closing the stream closes the generators too, for example when the
+    client disconnects before the end of the response body.
+    """
+    def __init__(self, value):
+        values = value.values() if isinstance(value, dict) else [value]
+        self._generators = [v for v in values
+                            if isinstance(v, types.GeneratorType)]
+        self._chunks = json_iterencode(value)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks).encode('utf-8')
+
+    next = __next__  # Python 2
+
+    def close(self):
+        self._chunks.close()
+        for generator in self._generators:
+            generator.close()
+
+
+def json_iterencode(value):
+    """Serialize the value in JSON, chunk by chunk. Generators are
+    serialized as lists, one chunk per item.
+    """
+    if isinstance(value, types.GeneratorType):
+        yield '['
+        for i, item in enumerate(value):
+            yield (',' if i > 0 else '') + json.dumps(item)
+        yield ']'
+    elif isinstance(value, dict):
+        yield '{'
+        for i, (key, item) in enumerate(value.items()):
+            yield (',' if i > 0 else '') + json.dumps(key) + ':'
+            for chunk in json_iterencode(item):
+                yield chunk
+        yield '}'
+    else:
+        yield json.dumps(value)
+
+
 def msec_time():
     """Return current epoch time in milliseconds."""
     return int(time.time() * 1000.0)  # floor
@@ -88,6 +137,7 @@ COMPARISON = Enum(
     NOT='!=',
     EQ='==',
     GT='>',
+    IN='in',
 )
 
 
@@ -1,3 +1,5 @@
+from collections import defaultdict, OrderedDict
+
 import colander
 import six
 
@@ -9,12 +11,32 @@ from six.moves.urllib import parse as urlparse
 
 from cliquet import errors
 from cliquet import logger
+from cliquet.storage import exceptions as storage_exceptions
 from cliquet.utils import json, merge_dicts
+from cliquet.views.errors import error as error_view
 
 
 valid_http_method = colander.OneOf(('GET', 'HEAD', 'DELETE', 'TRACE',
                                     'POST', 'PUT', 'PATCH'))
 
+bulk_http_methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+"""HTTP verbs of subrequests whose records writes can be run in bulk."""
+
+conditional_headers = ('If-Match', 'If-None-Match', 'If-Modified-Since',
+                       'If-Unmodified-Since', 'If-Range')
+"""Headers of conditional subrequests, which are never run in bulk."""
+
+bulk_resource_methods = ('collection_post', 'put', 'patch', 'delete',
+                         'create_record', 'update_record', 'delete_record')
+"""Methods of resources that must not be overridden for their records writes
+to be run in bulk."""
+
+storage_errors = (storage_exceptions.BackendError,
+                  storage_exceptions.IntegrityError,
+                  storage_exceptions.RecordNotFoundError)
+"""Errors of storage bulk writes, after which records are written one by
+one."""
+
 
 def string_values(node, cstruct):
     """Validate that a ``colander.Mapping`` only has strings in its values.
@@ -90,30 +112,8 @@ def post_batch(request):
 
     responses = []
 
-    sublogger = logger.new()
-
-    for subrequest_spec in requests:
-        subrequest = build_request(request, subrequest_spec)
-
-        sublogger.bind(path=subrequest.path,
-                       method=subrequest.method)
-
-        try:
-            subresponse = request.invoke_subrequest(subrequest)
-
-        except httpexceptions.HTTPException as e:
-            error_msg = 'Failed batch subrequest'
-            subresponse = errors.http_error(e, message=error_msg)
-        except Exception as e:
-            logger.error(e)
-            subresponse = errors.http_error(
-                httpexceptions.HTTPInternalServerError())
-
-        sublogger.bind(code=subresponse.status_code)
-        sublogger.info('subrequest.summary')
-
-        subresponse = build_response(subresponse, subrequest)
-        responses.append(subresponse)
+    for run in split_runs(request, requests):
+        responses += run_subrequests(request, run)
 
     # Rebing batch request for summary
     logger.bind(path=batch.path,
@@ -126,6 +126,330 @@ def post_batch(request):
     }
 
 
+def split_runs(original, requests):
+    """Split the subrequests specifications into runs of consecutive writes
+    with the same method, on the same collection and for the same user.
+
+    Conditional subrequests, subrequests with querystring, or writing a
+    record already written in the current run, start a new run.
+
+    :param original: the original batch request.
+    :param list requests: the sub-requests specifications.
+    :returns: the list of runs, each one being a list of specifications.
+    """
+    runs = []
+    previous_key = None
+    records_paths = set()
+    for dict_obj in requests:
+        key = bulk_key(original, dict_obj)
+        record_path = None
+        if dict_obj.get('method') != 'POST':
+            record_path = dict_obj['path']
+
+        same_run = (runs and key is not None and key == previous_key and
+                    record_path not in records_paths)
+        if not same_run:
+            runs.append([])
+            records_paths = set()
+        runs[-1].append(dict_obj)
+        previous_key = key
+        if record_path is not None:
+            records_paths.add(record_path)
+    return runs
+
+
+def bulk_key(original, dict_obj):
+    """Return what identifies the run of the specified sub-request, or
+    ``None`` if it cannot be part of one.
+
+    :param original: the original batch request.
+    :param dict_obj: a dict object with the sub-request specifications.
+    """
+    method = dict_obj.get('method') or 'GET'
+    if method not in bulk_http_methods:
+        return None
+
+    headers = dict(original.headers)
+    headers.update(**dict_obj.get('headers') or {})
+    names = [name.lower() for name in headers.keys()]
+    if any([name.lower() in names for name in conditional_headers]):
+        return None
+
+    path = dict_obj['path']
+    if '?' in path:
+        return None
+
+    collection_path = path if method == 'POST' else path.rsplit('/', 1)[0]
+    return (method, collection_path, headers.get('Authorization'))
+
+
+def run_subrequests(original, requests):
+    """Invoke the sub-requests of a run, and return their serialized
+    responses.
+
+    If there are several of them, their records writes are queued and sent
+    at once to the storage bulk methods (see :class:`BulkStorage`). If this
+    fails, nothing was written, and the queued records are written one by
+    one, so that each sub-request gets its own response. Sub-requests are
+    never run twice: the responses of failed writes are built as the
+    resource views would have.
+
+    Responses are serialized once the run is written, with the timestamps
+    of the written records.
+
+    :param original: the original batch request.
+    :param list requests: the sub-requests specifications of the run.
+    """
+    storage = None
+    if len(requests) > 1:
+        records_ids = [urlparse.unquote(dict_obj['path'].rsplit('/', 1)[1])
+                       for dict_obj in requests
+                       if dict_obj.get('method') != 'POST']
+        storage = BulkStorage(original.registry.storage, records_ids)
+
+    subrequests = []
+    subresponses = []
+    for i, dict_obj in enumerate(requests):
+        subrequest = build_request(original, dict_obj)
+        if storage is not None:
+            subrequest.db = storage
+            storage.current = i
+
+        subresponse = invoke_subrequest(original, subrequest)
+        if storage is not None and subresponse.status_code >= 400:
+            storage.discard(i)
+
+        subrequests.append(subrequest)
+        subresponses.append(subresponse)
+
+    if storage is not None:
+        written, failed = storage.flush()
+        for i, (resource, e) in failed.items():
+            context = storage_error(resource, e)
+            subresponses[i] = error_view(context, subrequests[i])
+
+        for i, records in written.items():
+            subresponse = subresponses[i]
+            body = subresponse.json
+            for resource, record in records:
+                if body.get(resource.id_field) == record[resource.id_field]:
+                    body[resource.modified_field] = \
+                        record[resource.modified_field]
+            subresponse.json_body = body
+
+    return [build_response(subresponse, subrequest)
+            for subresponse, subrequest in zip(subresponses, subrequests)]
+
+
+def invoke_subrequest(original, subrequest):
+    """Invoke the specified sub-request, and return its response, or an
+    error response if it failed.
+
+    :param original: the original batch request.
+    :param subrequest: the sub-request, as built by :func:`build_request`.
+    """
+    sublogger = logger.new()
+    sublogger.bind(path=subrequest.path,
+                   method=subrequest.method)
+
+    try:
+        subresponse = original.invoke_subrequest(subrequest)
+    except Exception as e:
+        subresponse = error_response(e)
+
+    sublogger.bind(code=subresponse.status_code)
+    sublogger.info('subrequest.summary')
+    return subresponse
+
+
+def error_response(exception):
+    """Return the response of a sub-request that failed with the specified
+    `exception`.
+    """
+    if isinstance(exception, httpexceptions.HTTPException):
+        error_msg = 'Failed batch subrequest'
+        return errors.http_error(exception, message=error_msg)
+
+    logger.error(exception)
+    return errors.http_error(httpexceptions.HTTPInternalServerError())
+
+
+def storage_error(resource, exception):
+    """Return the HTTP error raised by the views of `resource` for the
+    specified storage `exception`, or the exception itself if none is.
+    """
+    try:
+        if isinstance(exception, storage_exceptions.UnicityError):
+            resource._raise_conflict(exception)
+        if isinstance(exception, storage_exceptions.RecordNotFoundError):
+            resource._raise_404()
+    except httpexceptions.HTTPException as e:
+        return e
+    return exception
+
+
+class BulkStorage(object):
+    """Storage proxy given to the sub-requests of a run, which queues their
+    records writes instead of sending them to the storage, in order to write
+    them at once using the storage bulk methods (see :meth:`flush`).
+
+    The records targeted by the sub-requests are fetched at once too, using
+    the storage :meth:`~cliquet.storage.StorageBase.get_many` method. Other
+    storage methods are left untouched.
+
+    Records writes are queued only for resources that do not override any of
+    the :data:`bulk_resource_methods`, and unconditionally. Otherwise, they
+    are sent to the storage right away.
+
+    .. note::
+
+        Created records are given their ids upfront. The records returned by
+        writes have no timestamp until the run is written.
+    """
+    def __init__(self, storage, records_ids=None):
+        self.storage = storage
+        self.current = None
+        """Index of the current sub-request in the run."""
+        self.records_ids = records_ids or []
+        """Ids of the records targeted by the sub-requests of the run."""
+        self._fetched = {}
+        self._queued = OrderedDict()
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    def get(self, resource, user_id, record_id):
+        if record_id not in self.records_ids:
+            return self.storage.get(resource, user_id, record_id)
+
+        key = (resource.name, user_id)
+        if key not in self._fetched:
+            records = self.storage.get_many(resource, user_id,
+                                            self.records_ids)
+            self._fetched[key] = dict([(r[resource.id_field], r)
+                                       for r in records])
+        fetched = self._fetched[key]
+        if record_id not in fetched:
+            raise storage_exceptions.RecordNotFoundError(record_id)
+        return fetched[record_id]
+
+    def create(self, resource, user_id, record):
+        if not self._can_queue(resource):
+            return self.storage.create(resource, user_id, record)
+
+        record = record.copy()
+        record[resource.id_field] = resource.id_generator()
+        return self._queue('create', resource, user_id, record)
+
+    def update(self, resource, user_id, record_id, record,
+               if_unmodified_since=None):
+        if if_unmodified_since is not None or not self._can_queue(resource):
+            return self.storage.update(resource, user_id, record_id, record,
+                                       if_unmodified_since)
+
+        record = record.copy()
+        record[resource.id_field] = record_id
+        return self._queue('update', resource, user_id, record)
+
+    def delete(self, resource, user_id, record_id, if_unmodified_since=None):
+        if if_unmodified_since is not None or not self._can_queue(resource):
+            return self.storage.delete(resource, user_id, record_id,
+                                       if_unmodified_since)
+
+        record = {}
+        record[resource.id_field] = record_id
+        record[resource.deleted_field] = True
+        return self._queue('delete', resource, user_id, record)
+
+    def _can_queue(self, resource):
+        """Return ``True`` if the records writes of `resource` can be queued,
+        i.e. if the responses of its views are the written records, and can
+        thus be given their timestamps once the run is written.
+        """
+        from cliquet.resource import BaseResource
+
+        for klass in type(resource).__mro__:
+            if klass is BaseResource:
+                return True
+            overridden = [name for name in bulk_resource_methods
+                          if name in vars(klass)]
+            if overridden:
+                return False
+        return False
+
+    def _queue(self, operation, resource, user_id, record):
+        record[resource.modified_field] = None
+        key = (operation, resource.name, user_id)
+        resource, queued = self._queued.setdefault(key, (resource, []))
+        queued.append((self.current, record))
+        return record.copy()
+
+    def discard(self, index):
+        """Forget the writes of the sub-request at the specified `index`."""
+        for resource, queued in self._queued.values():
+            queued[:] = [(i, r) for (i, r) in queued if i != index]
+
+    def flush(self):
+        """Write the queued records, with one storage call per collection
+        and operation.
+
+        If one of these calls fails, nothing was written for it, and its
+        records are written one by one instead.
+
+        :returns: the written records, with their resource, by index of the
+            sub-request that queued them, and the storage errors, with their
+            resource, by index of the sub-request whose write failed.
+        :rtype: tuple
+        """
+        written = defaultdict(list)
+        failed = {}
+        for key, (resource, queued) in self._queued.items():
+            operation, _, user_id = key
+            records = []
+            for index, record in queued:
+                record = record.copy()
+                record.pop(resource.modified_field)
+                records.append(record)
+
+            try:
+                results = self._write_many(operation, resource, user_id,
+                                           records)
+            except storage_errors:
+                results = []
+                for (index, _), record in zip(queued, records):
+                    try:
+                        result = self._write_one(operation, resource,
+                                                 user_id, record)
+                    except storage_errors as e:
+                        failed[index] = (resource, e)
+                        result = None
+                    results.append(result)
+
+            for (index, _), result in zip(queued, results):
+                if result is not None:
+                    written[index].append((resource, result))
+
+        self._queued.clear()
+        return written, failed
+
+    def _write_many(self, operation, resource, user_id, records):
+        if operation == 'create':
+            return self.storage.create_many(resource, user_id, records)
+        if operation == 'update':
+            return self.storage.update_many(resource, user_id, records)
+        records_ids = [r[resource.id_field] for r in records]
+        return self.storage.delete_many(resource, user_id, records_ids)
+
+    def _write_one(self, operation, resource, user_id, record):
+        if operation == 'create':
+            # Unlike ``create()``, the id given upfront is kept.
+            return self.storage.create_many(resource, user_id, [record])[0]
+        record_id = record[resource.id_field]
+        if operation == 'update':
+            return self.storage.update(resource, user_id, record_id, record)
+        return self.storage.delete(resource, user_id, record_id)
+
+
 def build_request(original, dict_obj):
     """
     Transform a dict object into a ``pyramid.request.Request`` object.
@@ -158,6 +482,8 @@ def build_request(original, dict_obj):
                             headers=headers,
                             POST=payload,
                             method=method)
+    # Subrequests share the storage transaction of the batch request.
+    request.parent = original
 
     return request
 
@@ -33,6 +33,10 @@ POSTGRESQL_REQUIRES = [
     'psycopg2>2.5',
 ]
 
+MSGPACK_REQUIRES = [
+    'msgpack',
+]
+
 MONITORING_REQUIRES = [
     'raven',
     'statsd',
@@ -69,6 +73,7 @@ setup(name='cliquet',
       extras_require={
           'postgresql': REQUIREMENTS + POSTGRESQL_REQUIRES,
           'monitoring': REQUIREMENTS + MONITORING_REQUIRES,
+          'msgpack': REQUIREMENTS + MSGPACK_REQUIRES,
       },
       dependency_links=DEPENDENCY_LINKS,
       entry_points=ENTRY_POINTS)